@@ -16,12 +16,49 @@ import logging
 from contextlib import contextmanager
 import time
 import platform
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 BASE = os.path.dirname(__file__)
 GRAPHS_TOML = os.path.join(BASE, "graphs.toml")
 CONFIG_TOML = os.path.join(BASE, "config.toml")
 GRAPHS_DIR = os.path.join(BASE, "graphs")
 RESULTS_DIR = os.path.join(BASE, "results")
+# The graph suite whose members are generated rather than fetched.
+SYNTHETIC = "synthetic"
+# Parameter letters in a synthetic graph name, like `n1e6_p100`, and the
+# `pollen_data_gen synthetic` options they stand for.
+SYNTHETIC_PARAMS = {
+    "n": "--segments",
+    "p": "--paths",
+    "l": "--path-length",
+    "v": "--variants",
+    "i": "--inversions",
+    "s": "--seg-len",
+    "seed": "--seed",
+}
+# The columns of a results CSV. Times are in seconds: `user` and `sys` are
+# mean CPU times. `peak_mem` (peak RSS) and the I/O counts are in bytes.
+CSV_FIELDS = [
+    "graph",
+    "cmd",
+    "mode",
+    "size",
+    "threads",
+    "mean",
+    "stddev",
+    "n",
+    "peak_mem",
+    "user",
+    "sys",
+    "io_read",
+    "io_write",
+]
+# `ru_maxrss` is in kilobytes on Linux but in bytes on macOS.
+MAXRSS_UNIT = 1 if platform.system() == "Darwin" else 1024
+# `ru_inblock` and `ru_oublock` count 512-byte blocks.
+BLOCK_SIZE = 512
 DECOMPRESS = {
     ".gz": ["gunzip"],
     ".zst": ["zstd", "-d"],
@@ -51,6 +88,8 @@ class HyperfineResult:
     min: float
     max: float
     count: float
+    user: float
+    system: float
 
     @classmethod
     def from_json(cls, obj):
@@ -62,6 +101,8 @@ class HyperfineResult:
             min=obj["min"],
             max=obj["max"],
             count=len(obj["times"]),
+            user=obj["user"],
+            system=obj["system"],
         )
 
 
@@ -86,11 +127,97 @@ def hyperfine(cmds):
         os.unlink(tmp.name)
 
 
+def measure(cmd):
+    """Run a shell command once and return its resource usage, which
+    includes that of any processes it waited for (i.e., the command that
+    the shell runs). Like Hyperfine, raise an error if the command fails,
+    since a failed run's usage says nothing about the tool.
+    """
+    proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return usage
+
+
 def graph_path(name, ext):
     return os.path.join(GRAPHS_DIR, f"{name}.{ext}")
 
 
+def partial_path(name, ext):
+    """A temporary file to build an artifact in. It keeps the artifact's
+    extension, since tools may pick a format based on it."""
+    return graph_path(f"{name}.partial", ext)
+
+
+@contextmanager
+def building(tmp):
+    """Remove the temporary file `tmp` if building it fails."""
+    try:
+        yield
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def manifest_path(path):
+    return f"{path}.manifest.json"
+
+
+def file_digest(path):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def record_artifact(path, source):
+    """Write the manifest for a freshly built artifact. `source` identifies
+    what it was built from: a URL, or the digest of the GFA it came from."""
+    st = os.stat(path)
+    manifest = {
+        "digest": file_digest(path),
+        "source": source,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+    tmp = f"{manifest_path(path)}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path(path))
+    return manifest["digest"]
+
+
+def artifact_digest(path, source):
+    """Check an artifact against its manifest, returning its digest if it
+    is complete and up to date (and None if it must be rebuilt).
+
+    An artifact is stale if it was built from a different source or if its
+    contents no longer match the recorded digest. To avoid rehashing large
+    files on every run, we trust a file whose size and modification time
+    match the manifest.
+    """
+    try:
+        with open(manifest_path(path)) as f:
+            manifest = json.load(f)
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("source") != source:
+        return None
+    if (st.st_size, st.st_mtime_ns) == (manifest["size"], manifest["mtime_ns"]):
+        return manifest["digest"]
+    if file_digest(path) == manifest["digest"]:
+        return record_artifact(path, source)
+    return None
+
+
 def fetch_file(dest, url):
+    """Download a file to `dest`, which must not be the final location of
+    the file (see `Runner.fetch_graph`)."""
     os.makedirs(GRAPHS_DIR, exist_ok=True)
 
     _, ext = os.path.splitext(url)
@@ -107,6 +234,23 @@ def fetch_file(dest, url):
         subprocess.run(["curl", "-L", "-o", dest, url], check=True)
 
 
+def synthetic_args(key):
+    """Get the generator options for a synthetic graph name like
+    `n1e6_p100`: each `_`-separated part is a parameter letter followed by
+    its value. Counts may be written in scientific notation.
+    """
+    args = []
+    for part in key.split("_"):
+        m = re.fullmatch(r"([a-z]+)([0-9.e]+)", part)
+        assert m and m.group(1) in SYNTHETIC_PARAMS, f"bad synthetic graph {key}"
+        letter, value = m.groups()
+        if letter in ("v", "i"):
+            args += [SYNTHETIC_PARAMS[letter], value]
+        else:
+            args += [SYNTHETIC_PARAMS[letter], str(int(float(value)))]
+    return args
+
+
 class Runner:
     def __init__(self, graphs, config):
         self.graphs = graphs
@@ -137,51 +281,105 @@ class Runner:
                 "og": quote(graph_path(graph, "og")),
                 "flatgfa": quote(graph_path(graph, "flatgfa")),
             },
+            "threads": 1,
             **self.config["tools"],
         }
 
     def fetch_graph(self, name):
-        """Fetch a single graph, given by its <suite>.<graph> name."""
-        suite, key = name.split(".")
-        url = self.graphs[suite][key]
+        """Fetch a single graph, given by its <suite>.<graph> name, and
+        return the digest of its GFA file.
+
+        Every artifact is built in a temporary file and then moved into
+        place, and it gets a manifest (see `artifact_digest`). So an
+        interrupted download is never mistaken for a complete one.
+        """
+        suite, key = name.split(".", 1)
         dest = graph_path(name, "gfa")
+        source = f"{SYNTHETIC}:{key}" if suite == SYNTHETIC else self.graphs[suite][key]
 
-        # If the file exists, don't re-download.
-        if os.path.exists(dest):
+        # If the file is complete, don't re-download.
+        digest = artifact_digest(dest, source)
+        if digest:
             self.log.info("gfa already fetched for %s", name)
-            return
-
-        self.log.info("fetching graph %s", name)
-        fetch_file(dest, url)
-
-    def convert(self, graph, tool, ext):
-        """Convert a graph to a new format, unless the file already exists."""
+            return digest
+
+        tmp = partial_path(name, "gfa")
+        with building(tmp):
+            if suite == SYNTHETIC:
+                self.generate_graph(tmp, key)
+            else:
+                self.log.info("fetching graph %s", name)
+                fetch_file(tmp, source)
+        os.replace(tmp, dest)
+        return record_artifact(dest, source)
+
+    def generate_graph(self, dest, key):
+        """Generate a synthetic graph, given the <graph> part of its name."""
+        os.makedirs(GRAPHS_DIR, exist_ok=True)
+        cmd = [self.config["tools"]["pollen_data_gen"], "synthetic"]
+        cmd += synthetic_args(key)
+        self.log.info("generating graph %s", key)
+        with logtime(self.log), open(dest, "w") as f:
+            subprocess.run(cmd, stdout=f, check=True)
+
+    def convert(self, graph, tool, ext, gfa_digest):
+        """Convert a graph to a new format, unless an up-to-date conversion
+        of the same GFA file already exists."""
         dest = graph_path(graph, ext)
-        if os.path.exists(dest):
+        if artifact_digest(dest, gfa_digest):
             self.log.info("%s already exists for %s", ext, graph)
             return
 
+        # Point the command's output at a temporary file.
+        tmp = partial_path(graph, ext)
+        vals = self._cmd_vals(graph)
+        vals["files"][ext] = quote(tmp)
+        cmd = self.config["modes"]["convert"]["cmd"][tool].format(**vals)
+
         self.log.info("converting %s to %s", graph, ext)
-        cmd = self.config["modes"]["convert"]["cmd"][tool].format(
-            **self._cmd_vals(graph)
-        )
-        with logtime(self.log):
-            subprocess.run(cmd, shell=True)
+        with logtime(self.log), building(tmp):
+            subprocess.run(cmd, shell=True, check=True)
+        os.replace(tmp, dest)
+        record_artifact(dest, gfa_digest)
+
+    def conversions(self, mode, tools):
+        """The (tool, extension) conversions that `tools` need for `mode`."""
+        if not self.config["modes"][mode].get("convert", True):
+            return set()
+        convs = set()
+        for tool in tools:
+            match tool:
+                case "odgi":
+                    convs.add(("odgi", "og"))
+                case "flatgfa" | "slow_odgi_flatgfa":
+                    convs.add(("flatgfa", "flatgfa"))
+        return convs
 
     def prepare_files(self, graph, mode, tools):
         """Ensure that all the input files are ready for a benchmarking run.
 
         We first fetch the graph. Then, if the mode requires it, we convert the graph to the
-        necessary formats for `tools`. Each step is skipped if the files already exist.
+        necessary formats for `tools`. Each step is skipped if its files are up to date.
+        """
+        digest = self.fetch_graph(graph)
+        for tool, ext in sorted(self.conversions(mode, tools)):
+            self.convert(graph, tool, ext, digest)
+
+    def prepare_all(self, graphs, mode, tools, jobs):
+        """Like `prepare_files` for several graphs, running up to `jobs`
+        fetches and conversions at once. A graph's conversions start as
+        soon as it has been fetched.
         """
-        self.fetch_graph(graph)
-        if self.config["modes"][mode].get("convert", True):
-            for tool in tools:
-                match tool:
-                    case "odgi":
-                        self.convert(graph, "odgi", "og")
-                    case "flatgfa":
-                        self.convert(graph, "flatgfa", "flatgfa")
+        convs = sorted(self.conversions(mode, tools))
+        with ThreadPoolExecutor(jobs) as pool:
+            fetches = {pool.submit(self.fetch_graph, g): g for g in graphs}
+            converts = []
+            for fetch in as_completed(fetches):
+                graph, digest = fetches[fetch], fetch.result()
+                for tool, ext in convs:
+                    converts.append(pool.submit(self.convert, graph, tool, ext, digest))
+            for convert in converts:
+                convert.result()
 
     def compare(self, mode, graph, commands):
         """Run a Hyperfine comparison and produce CSV lines for the results.
@@ -191,13 +389,24 @@ class Runner:
         self.log.info("comparing %s for %s", mode, " ".join(commands.keys()))
         with logtime(self.log):
             results = hyperfine(list(commands.values()))
-        for cmd, res in zip(commands.keys(), results):
+
+        # Hyperfine doesn't report memory or I/O, so we run each command
+        # once more to measure those.
+        self.log.info("measuring resource usage")
+        for (cmd, cmd_str), res in zip(commands.items(), results):
+            usage = measure(cmd_str)
             yield {
                 "cmd": cmd,
+                "mode": mode,
                 "mean": res.mean,
                 "stddev": res.stddev,
                 "graph": graph,
                 "n": res.count,
+                "peak_mem": usage.ru_maxrss * MAXRSS_UNIT,
+                "user": res.user,
+                "sys": res.system,
+                "io_read": usage.ru_inblock * BLOCK_SIZE,
+                "io_write": usage.ru_oublock * BLOCK_SIZE,
             }
 
     def compare_mode(self, mode, graph, tools):
@@ -210,11 +419,15 @@ class Runner:
         yield from self.compare(mode, graph, commands)
 
 
-def run_bench(graph_set, mode, tools, out_csv):
+def run_bench(graph_set, mode, tools, out_csv, jobs=4):
     runner = Runner.default()
 
-    # The input graphs we'll be using to do the comparison.
-    graph_names = runner.config["graph_sets"][graph_set]
+    # The input graphs we'll be using to do the comparison. A synthetic graph
+    # name may also be used by itself, like a set of one graph.
+    if graph_set.startswith(f"{SYNTHETIC}."):
+        graph_names = [graph_set]
+    else:
+        graph_names = runner.config["graph_sets"][graph_set]
 
     # Which tools are we comparing?
     if tools:
@@ -226,13 +439,12 @@ def run_bench(graph_set, mode, tools, out_csv):
         tools = list(runner.config["modes"][mode]["cmd"].keys())
 
     # Fetch all the graphs and convert them to both odgi and FlatGFA.
-    for graph in graph_names:
-        runner.prepare_files(graph, mode, tools)
+    runner.prepare_all(graph_names, mode, tools, jobs)
 
     runner.log.debug("writing results to %s", out_csv)
     os.makedirs(os.path.dirname(out_csv), exist_ok=True)
     with open(out_csv, "w") as f:
-        writer = csv.DictWriter(f, ["graph", "cmd", "mean", "stddev", "n"])
+        writer = csv.DictWriter(f, CSV_FIELDS)
         writer.writeheader()
         for graph in graph_names:
             assert mode in runner.config["modes"], "unknown mode"
@@ -241,6 +453,48 @@ def run_bench(graph_set, mode, tools, out_csv):
                 writer.writerow(row)
 
 
+def run_sweep(sweep_name, tools, out_csv, jobs=4):
+    """Measure how tools scale by running a mode on a series of graphs of
+    increasing size and, for tools whose command takes a `{threads}`
+    option, with each thread count.
+
+    The results are in long format, with one row per tool, size, and
+    thread count.
+    """
+    runner = Runner.default()
+    sweep = runner.config["sweeps"][sweep_name]
+    mode = sweep["mode"]
+    mode_cmds = runner.config["modes"][mode]["cmd"]
+    tools = tools or list(mode_cmds.keys())
+    for tool in tools:
+        assert tool in mode_cmds, f"unknown tool {tool}"
+
+    # The graph for each size, like `synthetic.n{size}_p10`.
+    graphs = {size: sweep["graph"].format(size=size) for size in sweep["sizes"]}
+    runner.prepare_all(list(graphs.values()), mode, tools, jobs)
+
+    thread_counts = sweep.get("threads", [1])
+    runner.log.debug("writing results to %s", out_csv)
+    os.makedirs(os.path.dirname(out_csv), exist_ok=True)
+    with open(out_csv, "w") as f:
+        writer = csv.DictWriter(f, CSV_FIELDS)
+        writer.writeheader()
+        for size, graph in graphs.items():
+            for threads in thread_counts:
+                # Tools without a threads option only run once.
+                subst = {**runner._cmd_vals(graph), "threads": threads}
+                commands = {
+                    tool: mode_cmds[tool].format(**subst)
+                    for tool in tools
+                    if "{threads}" in mode_cmds[tool] or threads == thread_counts[0]
+                }
+                for row in runner.compare(mode, graph, commands):
+                    threaded = "{threads}" in mode_cmds[row["cmd"]]
+                    row["size"] = int(float(size))
+                    row["threads"] = threads if threaded else 1
+                    writer.writerow(row)
+
+
 def gen_csv_name(graph_set, mode):
     host = platform.node().split(".")[0]
     ts = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S.%f")
@@ -249,20 +503,40 @@ def gen_csv_name(graph_set, mode):
 
 def bench_main():
     parser = argparse.ArgumentParser(description="benchmarks for GFA stuff")
+    parser.add_argument("--graph-set", "-g", help="name of input graph set")
+    parser.add_argument("--mode", "-m", help="thing to benchmark")
     parser.add_argument(
-        "--graph-set", "-g", help="name of input graph set", required=True
+        "--sweep", "-s", help="measure scaling with a sweep from the config"
     )
-    parser.add_argument("--mode", "-m", help="thing to benchmark", required=True)
     parser.add_argument("--tool", "-t", help="test this tool", action="append")
     parser.add_argument("--output", "-o", help="output CSV")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="fetch and convert this many graphs at once",
+        type=int,
+        default=4,
+    )
 
     args = parser.parse_args()
 
+    if args.sweep:
+        run_sweep(
+            sweep_name=args.sweep,
+            tools=args.tool,
+            out_csv=args.output or gen_csv_name(args.sweep, "sweep"),
+            jobs=args.jobs,
+        )
+        return
+    if not args.graph_set or not args.mode:
+        parser.error("either --sweep or both --graph-set and --mode are required")
+
     run_bench(
         graph_set=args.graph_set,
         mode=args.mode,
         tools=args.tool,
         out_csv=args.output or gen_csv_name(args.graph_set, args.mode),
+        jobs=args.jobs,
     )
 
 
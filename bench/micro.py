@@ -0,0 +1,189 @@
+"""In-process benchmarks for mygfa and slow_odgi.
+
+Where `bench.py` times whole processes with Hyperfine, this times each
+stage (parsing, emitting, building an index, or running one slow_odgi
+command) inside a single Python process, so that a regression can be
+pinned on a stage. Run it as `python -m bench.micro` from the repository
+root. The output CSV has the same columns as `bench.py`'s, so `summary.py`
+can read it, although peak memory here is the Python heap's (as traced by
+`tracemalloc`) and I/O is not measured.
+"""
+
+import argparse
+import csv
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+import mygfa
+import mygfa.preprocess
+from slow_odgi import (
+    chop,
+    crush,
+    degree,
+    depth,
+    flatten,
+    flip,
+    matrix,
+    overlap,
+    paths,
+    somepaths,
+    validate,
+)
+from .bench import BASE, Runner, gen_csv_name, graph_path, CSV_FIELDS
+
+
+def parse(filename):
+    with open(filename, "r", encoding="utf-8") as f:
+        return mygfa.Graph.parse(f)
+
+
+def some_path_names(graph):
+    """A few path names to use for the commands that query paths."""
+    return list(graph.paths)[:3]
+
+
+# The stages to time. Each takes the GFA filename, the parsed graph, and a
+# scratch directory for any files it writes. Output goes to /dev/null.
+STAGES = {
+    "parse": lambda fn, g, tmp: parse(fn),
+    "emit": lambda fn, g, tmp: g.emit(sys.stdout),
+    "node_steps": lambda fn, g, tmp: mygfa.preprocess.node_steps(g),
+    "adjlist": lambda fn, g, tmp: mygfa.preprocess.adjlist(g),
+    "pathseq": lambda fn, g, tmp: mygfa.preprocess.pathseq(g),
+    "chop": lambda fn, g, tmp: chop.chop(g, 3),
+    "crush": lambda fn, g, tmp: crush.crush(g),
+    "degree": lambda fn, g, tmp: degree.degree(g),
+    "depth": lambda fn, g, tmp: depth.depth(g, None),
+    "flatten": lambda fn, g, tmp: flatten.flatten(g, os.path.join(tmp, "flat.og")),
+    "flip": lambda fn, g, tmp: flip.flip_bulk(g),
+    "matrix": lambda fn, g, tmp: matrix.matrix(g),
+    "overlap": lambda fn, g, tmp: overlap.overlap(g, some_path_names(g)),
+    "paths": lambda fn, g, tmp: paths.paths(g),
+    "somepaths": lambda fn, g, tmp: somepaths.somepaths(g, 50),
+    "validate": lambda fn, g, tmp: validate.validate(g),
+}
+
+
+def time_stage(func, runs):
+    """Run `func` `runs` times and return the mean and standard deviation of
+    its running time, its mean user and system CPU times, and its peak
+    traced memory (from one extra run)."""
+    times = []
+    cpu_start = os.times()
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    cpu_end = os.times()
+    user = (cpu_end.user - cpu_start.user) / runs
+    sys_ = (cpu_end.system - cpu_start.system) / runs
+
+    # Tracing slows allocation down, so we measure memory separately.
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stddev = statistics.stdev(times) if runs > 1 else 0.0
+    return statistics.mean(times), stddev, user, sys_, peak
+
+
+def bench_graph(name, filename, stages, runs, tmp, log):
+    """Time every stage on a single graph, yielding a CSV row for each."""
+    graph = parse(filename)
+    for stage in stages:
+        log.info("timing %s on %s", stage, name)
+        func = STAGES[stage]
+        try:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                mean, stddev, user, sys_, peak = time_stage(
+                    lambda: func(filename, graph, tmp), runs
+                )
+        except Exception as exc:
+            log.warning("%s failed on %s: %s", stage, name, exc)
+            continue
+        yield {
+            "graph": name,
+            "cmd": stage,
+            "mode": "micro",
+            "mean": mean,
+            "stddev": stddev,
+            "n": runs,
+            "peak_mem": peak,
+            "user": user,
+            "sys": sys_,
+        }
+
+
+def run_micro(graph_set, gfas, stages, runs, out_csv):
+    runner = Runner.default()
+
+    # Graphs come from a named set (fetched or generated as for `bench.py`)
+    # or directly from GFA files.
+    graphs = {os.path.basename(fn): os.path.abspath(fn) for fn in gfas}
+    if graph_set:
+        if graph_set.startswith("synthetic."):
+            names = [graph_set]
+        else:
+            names = runner.config["graph_sets"][graph_set]
+        for name in names:
+            runner.fetch_graph(name)
+            graphs[name] = graph_path(name, "gfa")
+
+    runner.log.debug("writing results to %s", out_csv)
+    os.makedirs(os.path.dirname(out_csv) or ".", exist_ok=True)
+    tmp = os.path.join(os.path.dirname(out_csv) or ".", "micro-scratch")
+    os.makedirs(tmp, exist_ok=True)
+    with open(out_csv, "w") as f:
+        writer = csv.DictWriter(f, CSV_FIELDS)
+        writer.writeheader()
+        for name, filename in graphs.items():
+            for row in bench_graph(name, filename, stages, runs, tmp, runner.log):
+                writer.writerow(row)
+
+
+def micro_main():
+    parser = argparse.ArgumentParser(
+        description="in-process benchmarks for mygfa and slow_odgi"
+    )
+    parser.add_argument("--graph-set", "-g", help="name of input graph set")
+    parser.add_argument(
+        "--gfa", help="benchmark this GFA file", action="append", default=[]
+    )
+    parser.add_argument(
+        "--stage",
+        "-s",
+        help="time this stage",
+        action="append",
+        choices=list(STAGES),
+    )
+    parser.add_argument(
+        "--runs", "-n", help="timed runs per stage", type=int, default=5
+    )
+    parser.add_argument("--output", "-o", help="output CSV")
+
+    args = parser.parse_args()
+    if not args.graph_set and not args.gfa:
+        parser.error("give a --graph-set or at least one --gfa file")
+
+    out_csv = os.path.abspath(
+        args.output or gen_csv_name(args.graph_set or "files", "micro")
+    )
+    gfas = [os.path.abspath(fn) for fn in args.gfa]
+
+    # Tool paths in config.toml are relative to the bench directory.
+    os.chdir(BASE)
+    run_micro(
+        graph_set=args.graph_set,
+        gfas=gfas,
+        stages=args.stage or list(STAGES),
+        runs=args.runs,
+        out_csv=out_csv,
+    )
+
+
+if __name__ == "__main__":
+    micro_main()
@@ -1,53 +1,195 @@
+import argparse
 import csv
+import math
 import sys
 from collections import defaultdict
-from statistics import harmonic_mean
+from statistics import NormalDist, harmonic_mean
 
+SIZE_UNITS = ["B", "kB", "MB", "GB", "TB"]
 
-def summary():
-    reader = csv.DictReader(sys.stdin)
+
+def fmt_bytes(count):
+    for unit in SIZE_UNITS:
+        if count < 1000 or unit == SIZE_UNITS[-1]:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1000
+
+
+def peak_mem(row):
+    """Get a row's peak memory, if it was measured."""
+    value = row.get("peak_mem")
+    return float(value) if value else None
+
+
+def stddev(row):
+    """Get a row's standard deviation of its times, which is empty when the
+    command ran only once."""
+    value = row["stddev"]
+    return float(value) if value else None
+
+
+def summary(infile):
+    reader = csv.DictReader(infile)
     by_graph = defaultdict(dict)
     for row in reader:
         by_graph[row["graph"]][row["cmd"]] = row
 
     # Guess a suitable baseline by taking the fastest time on the first graph.
     first_res = next(iter(by_graph.values()))
-    min_row = min(first_res.values(), key=lambda r: r["mean"])
+    min_row = min(first_res.values(), key=lambda r: float(r["mean"]))
     baseline = min_row["cmd"]
 
     # Show each graph's times.
     ratios = defaultdict(list)
+    mem_ratios = defaultdict(list)
     for graph, cmds in by_graph.items():
         baseline_time = float(cmds[baseline]["mean"])
+        baseline_mem = peak_mem(cmds[baseline])
 
         print(graph)
         for cmd, row in cmds.items():
             mean = float(row["mean"])
-            stddev = float(row["stddev"])
+            spread = stddev(row) or 0.0
             ratio = mean / baseline_time
             ratios[cmd].append(ratio)
 
             if mean > 80:
                 mins = int(mean / 60)
                 secs = int(mean % 60)
-                print(f"  {cmd}: {mins}m{secs}s ± {stddev:.1f}", end="")
+                print(f"  {cmd}: {mins}m{secs}s ± {spread:.1f}", end="")
             else:
                 if mean < 0.2:
                     mean *= 1000
-                    stddev *= 1000
+                    spread *= 1000
                     unit = "ms"
                 else:
                     unit = "s"
-                print(f"  {cmd}: {mean:.1f} ± {stddev:.1f} {unit}", end="")
+                print(f"  {cmd}: {mean:.1f} ± {spread:.1f} {unit}", end="")
+
+            print(f" ({ratio:.1f}× {baseline})", end="")
 
-            print(f" ({ratio:.1f}× {baseline})")
+            mem = peak_mem(row)
+            if mem is not None and baseline_mem:
+                mem_ratio = mem / baseline_mem
+                mem_ratios[cmd].append(mem_ratio)
+                print(f", {fmt_bytes(mem)} peak ({mem_ratio:.1f}×)", end="")
+            print()
 
     # Show the average across graphs.
     print("harmonic mean")
     for cmd, cmd_ratios in ratios.items():
         hmean = harmonic_mean(cmd_ratios)
-        print(f"  {cmd}: {hmean:.1f}× {baseline}")
+        print(f"  {cmd}: {hmean:.1f}× {baseline}", end="")
+        if mem_ratios[cmd]:
+            mem_hmean = harmonic_mean(mem_ratios[cmd])
+            print(f", {mem_hmean:.1f}× memory", end="")
+        print()
+
+
+def read_results(filename):
+    """Read a results CSV into a dict keyed by (graph, cmd, mode). Results
+    from before the `mode` column existed have an empty mode. Rows from a
+    sweep also have a thread count, which we add to the command's name."""
+    results = {}
+    with open(filename, newline="") as f:
+        for r in csv.DictReader(f):
+            cmd = r["cmd"]
+            if r.get("threads"):
+                cmd += f"/{r['threads']}t"
+            results[(r["graph"], cmd, r.get("mode") or "")] = r
+    return results
+
+
+def ratio_ci(base, cur, confidence):
+    """The ratio of the current mean time to the baseline's, with a
+    confidence interval.
+
+    Each mean's standard error is its stddev over sqrt(n). The ratio's
+    relative error combines the two relative errors (the delta method), and
+    the interval is symmetric on a log scale. If either side ran only once,
+    and so has no stddev, there is no interval, and its bounds are None.
+    """
+    base_mean, cur_mean = float(base["mean"]), float(cur["mean"])
+    ratio = cur_mean / base_mean
+    base_stddev, cur_stddev = stddev(base), stddev(cur)
+    if base_stddev is None or cur_stddev is None:
+        return ratio, None, None
+    rel_err = math.hypot(
+        base_stddev / math.sqrt(float(base["n"])) / base_mean,
+        cur_stddev / math.sqrt(float(cur["n"])) / cur_mean,
+    )
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    spread = math.exp(z * rel_err)
+    return ratio, ratio / spread, ratio * spread
+
+
+def compare(baseline_csv, current_csv, threshold, confidence):
+    """Compare two results files row by row. Return the number of
+    significant regressions that exceed the threshold."""
+    baseline = read_results(baseline_csv)
+    current = read_results(current_csv)
+
+    failures = 0
+    for key, cur in current.items():
+        graph, cmd, mode = key
+        label = f"{graph} {cmd}" + (f" ({mode})" if mode else "")
+        if key not in baseline:
+            print(f"{label}: new")
+            continue
+
+        ratio, low, high = ratio_ci(baseline[key], cur, confidence)
+        if low is None or high is None:
+            print(f"{label}: {ratio:.2f}× (single run, no interval)")
+            continue
+        if low > 1:
+            verdict = "regression"
+            if ratio > 1 + threshold:
+                verdict = "REGRESSION"
+                failures += 1
+        elif high < 1:
+            verdict = "improvement"
+        else:
+            verdict = "no significant change"
+        print(f"{label}: {ratio:.2f}× [{low:.2f}, {high:.2f}] {verdict}")
+
+    for key in sorted(baseline.keys() - current.keys()):
+        graph, cmd, mode = key
+        print(f"{graph} {cmd}" + (f" ({mode})" if mode else "") + ": missing")
+
+    return failures
+
+
+def summary_main():
+    parser = argparse.ArgumentParser(description="summarize benchmark results")
+    subparsers = parser.add_subparsers(dest="command")
+    compare_parser = subparsers.add_parser(
+        "compare", help="check results for regressions against a baseline"
+    )
+    compare_parser.add_argument("--baseline", help="baseline CSV", required=True)
+    compare_parser.add_argument("--current", help="current CSV", required=True)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="fail on significant slowdowns larger than this fraction",
+    )
+    compare_parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="confidence level for the ratio intervals",
+    )
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        failures = compare(args.baseline, args.current, args.threshold, args.confidence)
+        if failures:
+            print(f"{failures} regressions above {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        # By default, summarize a results CSV from stdin.
+        summary(sys.stdin)
 
 
 if __name__ == "__main__":
-    summary()
+    summary_main()
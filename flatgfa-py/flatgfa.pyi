@@ -30,6 +30,7 @@ class Path:
     def __getitem__(self, idx: int) -> Handle: ...
     @overload
     def __getitem__(self, slice: slice) -> StepList: ...
+    def __len__(self) -> int: ...
 
 class Link:
     id: int
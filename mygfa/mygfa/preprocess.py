@@ -1,7 +1,49 @@
-from typing import List, Tuple, Dict
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, List, Tuple, Dict, Iterator, Optional, TypeVar, cast
 from . import gfa as mygfa
 
 
+F = TypeVar("F", bound=Callable[[mygfa.Graph], Any])
+
+# While `shared_indexes` is active, the results of `memoized` functions,
+# keyed by function name and graph identity. We also hold on to the graph
+# itself so that its `id` cannot be reused by another graph in the meantime.
+_memo: Optional[Dict[Tuple[str, int], Tuple[mygfa.Graph, Any]]] = None
+
+
+@contextmanager
+def shared_indexes() -> Iterator[None]:
+    """Within this context, each index below is computed at most once per
+    graph, and every caller gets the same object back.
+    The graphs, and the indexes themselves, must not be modified meanwhile.
+    """
+    global _memo
+    outer = _memo
+    _memo = {}
+    try:
+        yield
+    finally:
+        _memo = outer
+
+
+def memoized(func: F) -> F:
+    """Let `func`, a function of a single graph, share its result while
+    `shared_indexes` is active."""
+
+    @functools.wraps(func)
+    def wrapper(graph: mygfa.Graph) -> Any:
+        if _memo is None:
+            return func(graph)
+        key = (func.__name__, id(graph))
+        if key not in _memo:
+            _memo[key] = (graph, func(graph))
+        return _memo[key][1]
+
+    return cast(F, wrapper)
+
+
+@memoized
 def node_steps(graph: mygfa.Graph) -> Dict[str, List[Tuple[str, int, bool]]]:
     """For each segment in the graph,
     list the times the segment was crossed by a path"""
@@ -20,6 +62,7 @@ def node_steps(graph: mygfa.Graph) -> Dict[str, List[Tuple[str, int, bool]]]:
 HandleMap = Dict[mygfa.Handle, List[mygfa.Handle]]
 
 
+@memoized
 def adjlist(graph: mygfa.Graph) -> Tuple[HandleMap, HandleMap]:
     """Construct an adjacency list representation of the graph.
     This is via two dicts having the same type:
@@ -49,6 +92,7 @@ def handle_seq(graph: mygfa.Graph, handle: mygfa.Handle) -> mygfa.Strand:
     return seg.seq if handle.ori else seg.revcomp().seq
 
 
+@memoized
 def pathseq(graph: mygfa.Graph) -> Dict[str, str]:
     """Given a graph, precompute the _sequence_
     charted by each of the graph's paths.
@@ -3,7 +3,15 @@ import argparse
 import mygfa
 from typing import List
 
-from . import depth, simple
+from . import depth, image, simple, synthetic, tile
+
+
+def positive_int(value: str) -> int:
+    """An argparse type for arguments that must be positive integers."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
 
 
 def parse_args() -> tuple[argparse.ArgumentParser, argparse.Namespace]:
@@ -61,6 +69,78 @@ def parse_args() -> tuple[argparse.ArgumentParser, argparse.Namespace]:
         "--subset-paths",
         help="A file where each line is a path of the graph to consider when calculating node depth",
     )
+    depth_parser.add_argument(
+        "-b",
+        "--binary",
+        metavar="BLOB",
+        help="Write a binary memory image to BLOB (and its manifest to "
+        "BLOB.json) instead of printing JSON.",
+    )
+    depth_parser.add_argument(
+        "--shared-ptc",
+        action="store_true",
+        help="Emit paths_to_consider once, shared by all nodes, for an "
+        "accelerator generated with --shared-ptc.",
+    )
+    depth_parser.add_argument(
+        "--pes",
+        type=positive_int,
+        help="Bank the memories for an accelerator generated with this many "
+        "processing elements.",
+    )
+
+    tile_parser = subparsers.add_parser(
+        "tile",
+        help="Splits the graph into `depth` inputs for a fixed-size accelerator.",
+    )
+    tile_parser.add_argument(
+        "-n",
+        type=int,
+        required=True,
+        help="The accelerator's max number of nodes.",
+    )
+    tile_parser.add_argument(
+        "-e",
+        type=int,
+        required=True,
+        help="The accelerator's max number of steps per node.",
+    )
+    tile_parser.add_argument(
+        "-p",
+        type=int,
+        required=True,
+        help="The accelerator's max number of paths.",
+    )
+    tile_parser.add_argument(
+        "-s",
+        "--subset-paths",
+        help="A file where each line is a path of the graph to consider when calculating node depth",
+    )
+    tile_parser.add_argument(
+        "-o",
+        "--out",
+        required=True,
+        metavar="PREFIX",
+        help="Write tile k to PREFIX.tilek.data and the plan to PREFIX.tiles.json.",
+    )
+    tile_parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="Write each tile as a binary memory image (PREFIX.tilek.bin).",
+    )
+    tile_parser.add_argument(
+        "--shared-ptc",
+        action="store_true",
+        help="Emit paths_to_consider once per tile, for an accelerator "
+        "generated with --shared-ptc.",
+    )
+    tile_parser.add_argument(
+        "--pes",
+        type=positive_int,
+        help="Bank the memories for an accelerator generated with this many "
+        "processing elements.",
+    )
 
     # Add the graph argument to all subparsers.
     # Doing it this way means that the graph argument is sought _after_ the
@@ -68,6 +148,72 @@ def parse_args() -> tuple[argparse.ArgumentParser, argparse.Namespace]:
     for subparser in subparsers.choices.values():
         subparser.add_argument("graph", help="Input GFA file", metavar="GRAPH")
 
+    # These commands have no input graph, so they are added afterward.
+    image_parser = subparsers.add_parser(
+        "image2json", help="Converts a binary memory image back to JSON."
+    )
+    image_parser.add_argument(
+        "image", help="The image's blob or manifest", metavar="IMAGE"
+    )
+
+    defaults = synthetic.Params()
+    synthetic_parser = subparsers.add_parser(
+        "synthetic", help="Generates a synthetic GFA file for scale testing."
+    )
+    synthetic_parser.add_argument(
+        "-n",
+        "--segments",
+        type=int,
+        default=defaults.segments,
+        help="The number of segments.",
+    )
+    synthetic_parser.add_argument(
+        "-p",
+        "--paths",
+        type=int,
+        default=defaults.paths,
+        help="The number of paths.",
+    )
+    synthetic_parser.add_argument(
+        "-l",
+        "--path-length",
+        type=int,
+        default=defaults.path_length,
+        help="The number of sites each path crosses (default: all of them).",
+    )
+    synthetic_parser.add_argument(
+        "-v",
+        "--variants",
+        type=float,
+        default=defaults.variants,
+        help="The probability that a site is a bubble with two segments.",
+    )
+    synthetic_parser.add_argument(
+        "-i",
+        "--inversions",
+        type=float,
+        default=defaults.inversions,
+        help="The probability that a path step is traversed in reverse.",
+    )
+    synthetic_parser.add_argument(
+        "--seg-len",
+        type=int,
+        default=defaults.seg_len,
+        help="The mean segment length.",
+    )
+    synthetic_parser.add_argument(
+        "--seg-len-dist",
+        choices=["fixed", "uniform", "geometric"],
+        default=defaults.seg_len_dist,
+        help="How segment lengths are distributed.",
+    )
+    synthetic_parser.add_argument(
+        "--seed",
+        type=int,
+        default=defaults.seed,
+        help="The random seed.",
+    )
+
     args = parser.parse_args()
 
     return parser, args
@@ -92,11 +238,36 @@ def dispatch(args: argparse.Namespace) -> None:
     """
     subset_paths = parse_subset_paths(args.subset_paths)
     name_to_func = {
-        "depth": lambda g: depth.depth_stdout(g, args.n, args.e, args.p, subset_paths),
+        "depth": lambda g: (
+            image.depth_image(
+                g,
+                args.n,
+                args.e,
+                args.p,
+                subset_paths,
+                args.binary,
+                args.shared_ptc,
+                args.pes,
+            )
+            if args.binary
+            else depth.depth_stdout(
+                g, args.n, args.e, args.p, subset_paths, args.shared_ptc, args.pes
+            )
+        ),
         "simple": lambda g: simple.dump(
             g, sys.stdout, args.n, args.e, args.p, subset_paths
         ),
         "roundtrip": simple.roundtrip_test,
+        "tile": lambda g: tile.write_tiles(
+            tile.plan(tile.graph_node_paths(g, subset_paths), args.n, args.e, args.p),
+            args.out,
+            args.n,
+            args.e,
+            args.p,
+            args.shared_ptc,
+            args.binary,
+            args.pes,
+        ),
     }
     graph = mygfa.Graph.parse(open(args.graph, "r", encoding="utf-8"))
     name_to_func[args.command](graph)
@@ -105,6 +276,24 @@ def dispatch(args: argparse.Namespace) -> None:
 def main() -> None:
     """Parse command line arguments and run the appropriate subcommand."""
     parser, arguments = parse_args()
+    if arguments.command == "image2json":
+        image.image_to_json(arguments.image, sys.stdout)
+        return
+    if arguments.command == "synthetic":
+        synthetic.generate(
+            sys.stdout,
+            synthetic.Params(
+                segments=arguments.segments,
+                paths=arguments.paths,
+                path_length=arguments.path_length,
+                variants=arguments.variants,
+                inversions=arguments.inversions,
+                seg_len=arguments.seg_len,
+                seg_len_dist=arguments.seg_len_dist,
+                seed=arguments.seed,
+            ),
+        )
+        return
     if "graph" not in arguments or not arguments.graph:
         parser.print_help()
         exit(-1)
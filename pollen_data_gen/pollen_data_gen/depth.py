@@ -1,5 +1,7 @@
+import re
 import sys
-from typing import Any, Collection, Dict, Union, Optional, List
+from typing import Any, Collection, Dict, Iterable, Iterator, Union, Optional, List
+from typing import TextIO, Tuple
 import json
 from json import JSONEncoder
 import mygfa
@@ -8,6 +10,8 @@ import mygfa.preprocess
 
 FormatType = Dict[str, Union[bool, str, int]]
 OutputType = Dict[str, Dict[str, Collection[object]]]
+# A memory's name, contents, and format.
+MemoryType = Tuple[str, List[int], FormatType]
 
 
 def format_gen(width: int) -> FormatType:
@@ -43,7 +47,8 @@ def paths_to_consider(
     the i'th path is to be considered during depth calculation.
 
     Somewhat annoyingly, we need as many copies of this bitvector as there
-    are nodes in the graph.
+    are nodes in the graph. (`depth_memories` can emit a single shared copy
+    instead.)
     """
     output = {}
     data = []
@@ -116,30 +121,168 @@ def depth_json(
     """Returns a JSON representation of `graph`
     that is specific to the exine command `depth`.
     """
+    max_n, max_e, max_p = get_dimensions(graph, max_n, max_e, max_p)
+    return NodeDepthEncoder(
+        max_n=max_n, max_e=max_e, max_p=max_p, subset_paths=subset_paths
+    ).encode(graph)
+
+
+def get_dimensions(
+    graph: mygfa.Graph,
+    max_n: Optional[int],
+    max_e: Optional[int],
+    max_p: Optional[int],
+) -> Tuple[int, int, int]:
+    """Fill in any of the hardware dimensions that the user did not give."""
     n_tight, e_tight, p_tight = mygfa.preprocess.get_maxes(graph)
     # These values have been calculated automatically, and are likely optimal.
     # However, they are only to be used when the user-does not supply them via CLI.
-    if not max_n:
-        max_n = n_tight
-    if not max_e:
-        max_e = e_tight
-    if not max_p:
-        max_p = p_tight
+    return int(max_n or n_tight), int(max_e or e_tight), int(max_p or p_tight)
 
-    return NodeDepthEncoder(
-        max_n=int(max_n), max_e=int(max_e), max_p=int(max_p), subset_paths=subset_paths
-    ).encode(graph)
+
+def depth_memories(
+    graph: mygfa.Graph,
+    max_n: int,
+    max_e: int,
+    max_p: int,
+    subset_paths: Optional[List[str]],
+    shared_ptc: bool = False,
+) -> Iterator[MemoryType]:
+    """Yield the same memories that `NodeDepthEncoder` produces, one at a
+    time and in sorted name order (which is how `json.dump` with
+    `sort_keys=True` orders them). Each memory's data is only built when
+    it is yielded.
+
+    With `shared_ptc`, the paths-to-consider bitvector is emitted once, as
+    `paths_to_consider`, for an accelerator that copies it to every node.
+    This keeps the output's size linear in nodes plus paths.
+    """
+    path2id = {path: id for id, path in enumerate(graph.paths, start=1)}
+    crossings = mygfa.preprocess.node_steps(graph)
+    ids_format = format_gen(max_p.bit_length())
+    zeros = [0] * max_e
+
+    subset_paths_idx = [path2id[p] for p in subset_paths] if subset_paths else []
+    if subset_paths_idx:
+        consider = [0] * (max_p + 1)
+        for path_idx in subset_paths_idx:
+            consider[path_idx] = 1
+    else:
+        consider = [0] + ([1] * max_p)
+
+    # Map each memory's name to the segment whose path ids it holds. As in
+    # `paths_viewed_from_nodes`, padding nodes take precedence.
+    segs: Dict[str, Optional[str]] = {}
+    for seg in crossings:
+        segs[f"path_ids{seg}"] = seg
+    for i in range(len(graph.segments) + 1, max_n + 1):
+        segs[f"path_ids{i}"] = None
+    names = list(segs)
+    if shared_ptc:
+        names.append("paths_to_consider")
+    else:
+        names += [f"paths_to_consider{i}" for i in range(1, max_n + 1)]
+    names += ["depth_output", "uniq_output"]
+
+    for name in sorted(names):
+        if name == "depth_output":
+            yield name, [0] * max_n, format_gen(max_e.bit_length())
+        elif name == "uniq_output":
+            yield name, [0] * max_n, format_gen(max_p.bit_length())
+        elif name in segs:
+            node = segs[name]
+            if node is None:
+                yield name, zeros, ids_format
+            else:
+                data = [path2id[c[0]] for c in crossings[node]]
+                yield name, data + [0] * (max_e - len(data)), ids_format
+        else:
+            yield name, consider, format_gen(1)
+
+
+def pe_banks(max_n: int, pes: int) -> List[range]:
+    """Split the node slots 1..`max_n` into consecutive banks, one for each
+    processing element of an accelerator with `pes` of them. Every bank but
+    the last has `ceil(max_n / pes)` nodes; there may be fewer than `pes`
+    banks if nodes run out first.
+    """
+    if pes < 1:
+        raise ValueError(f"an accelerator needs at least one PE, not {pes}")
+    per_pe = -(-max_n // pes)
+    return [
+        range(start, min(start + per_pe, max_n + 1))
+        for start in range(1, max_n + 1, per_pe)
+    ]
+
+
+def bank_memories(
+    memories: Iterable[MemoryType], max_n: int, pes: int
+) -> Iterator[MemoryType]:
+    """Rearrange per-node memories for an accelerator with `pes` processing
+    elements. The `path_ids` of the nodes in bank k are concatenated into
+    `path_ids_bank{k}`, and each bank gets one `paths_to_consider_bank{k}`
+    (unless `paths_to_consider` is already shared). Unlike
+    `depth_memories`, this holds every memory at once.
+    """
+    per_node: Dict[str, Tuple[List[int], FormatType]] = {}
+    banked = []
+    for name, data, fmt in memories:
+        if re.fullmatch(r"(path_ids|paths_to_consider)\d+", name):
+            per_node[name] = (data, fmt)
+        else:
+            banked.append((name, data, fmt))
+
+    for k, bank in enumerate(pe_banks(max_n, pes), start=1):
+        ids_format = per_node[f"path_ids{bank.start}"][1]
+        ids = [x for i in bank for x in per_node[f"path_ids{i}"][0]]
+        banked.append((f"path_ids_bank{k}", ids, ids_format))
+        if f"paths_to_consider{bank.start}" in per_node:
+            ptc, ptc_format = per_node[f"paths_to_consider{bank.start}"]
+            banked.append((f"paths_to_consider_bank{k}", ptc, ptc_format))
+    return iter(sorted(banked, key=lambda m: m[0]))
+
+
+def write_json(memories: Iterable[MemoryType], out: TextIO) -> None:
+    """Write memories to `out` exactly as `json.dump` would, with
+    `indent=2` and `sort_keys=True`, but one memory at a time. The
+    memories must already be in sorted order.
+    """
+    out.write("{")
+    sep = "\n"
+    for name, data, fmt in memories:
+        out.write(f'{sep}  {json.dumps(name)}: {{\n    "data": ')
+        sep = ",\n"
+        if data:
+            out.write("[\n      ")
+            out.write(",\n      ".join(map(str, data)))
+            out.write("\n    ]")
+        else:
+            out.write("[]")
+        out.write(',\n    "format": {\n')
+        out.write(
+            ",\n".join(
+                f"      {json.dumps(k)}: {json.dumps(v)}"
+                for k, v in sorted(fmt.items())
+            )
+        )
+        out.write("\n    }\n  }")
+    out.write("}" if sep == "\n" else "\n}")
 
 
 def depth_stdout(
-    graph: mygfa.Graph, max_n: int, max_e: int, max_p: int, subset_paths: List[str]
+    graph: mygfa.Graph,
+    max_n: int,
+    max_e: int,
+    max_p: int,
+    subset_paths: List[str],
+    shared_ptc: bool = False,
+    pes: Optional[int] = None,
 ) -> None:
-    """Prints a JSON representation of `graph` to stdout."""
-    encoding = depth_json(graph, max_n, max_e, max_p, subset_paths)
-
-    json.dump(
-        json.loads(encoding),
-        sys.stdout,
-        indent=2,
-        sort_keys=True,
-    )
+    """Prints a JSON representation of `graph` to stdout, banked for `pes`
+    processing elements if given.
+    """
+    max_n, max_e, max_p = get_dimensions(graph, max_n, max_e, max_p)
+    memories = depth_memories(graph, max_n, max_e, max_p, subset_paths, shared_ptc)
+    if pes is not None:
+        memories = bank_memories(memories, max_n, pes)
+    write_json(memories, sys.stdout)
@@ -0,0 +1,171 @@
+"""Binary memory images: a compact alternative to the JSON data files.
+
+An image is a pair of files. The *blob* holds every memory's contents,
+one after another, as a packed little-endian array of unsigned integers.
+Each element takes the smallest of 1, 2, 4, or 8 bytes that fits the
+memory's declared width (wider memories use as many bytes as they need),
+and each memory starts at a multiple of its element size, so the arrays
+can be mapped directly. The *manifest*, a small JSON file next to the
+blob, lists the memories in order with their offsets, lengths, element
+sizes, and formats. Most memories share a handful of formats, so the
+manifest lists each distinct format once, in a table, and each memory
+gives the index of its format there.
+
+Converting an image back to JSON gives exactly the file that
+`depth.write_json` would have written for the same memories.
+"""
+
+import json
+import os
+import sys
+from array import array
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO
+from typing import Tuple
+import mygfa
+
+from .depth import FormatType, MemoryType, bank_memories, depth_memories, get_dimensions
+from .depth import write_json
+
+MANIFEST_EXT = ".json"
+
+# The array typecode for each element size we can pack natively.
+TYPECODES = {array(code).itemsize: code for code in "BHILQ"}
+
+
+def manifest_path(blob: str) -> str:
+    """The manifest that describes the blob at `blob`."""
+    return blob + MANIFEST_EXT
+
+
+def elem_size(width: int) -> int:
+    """The number of bytes that one element of a `width`-bit memory takes."""
+    nbytes = max(1, (width + 7) // 8)
+    for size in (1, 2, 4, 8):
+        if nbytes <= size:
+            return size
+    return nbytes
+
+
+def pack(data: List[int], size: int) -> bytes:
+    """Pack `data` as little-endian unsigned integers of `size` bytes."""
+    if size in TYPECODES:
+        arr = array(TYPECODES[size], data)
+        if sys.byteorder == "big":
+            arr.byteswap()
+        return arr.tobytes()
+    return b"".join(x.to_bytes(size, "little") for x in data)
+
+
+def unpack(buf: bytes, size: int) -> List[int]:
+    """The inverse of `pack`."""
+    if size in TYPECODES:
+        arr = array(TYPECODES[size])
+        arr.frombytes(buf)
+        if sys.byteorder == "big":
+            arr.byteswap()
+        return arr.tolist()
+    return [
+        int.from_bytes(buf[i : i + size], "little") for i in range(0, len(buf), size)
+    ]
+
+
+def write_blob(
+    memories: Iterable[MemoryType], out: BinaryIO
+) -> Tuple[List[Dict[str, Any]], List[FormatType]]:
+    """Write each memory's packed contents to `out`. Return the manifest
+    entries that describe them and the table of formats that the entries
+    refer to.
+    """
+    entries = []
+    formats: List[FormatType] = []
+    format_ids: Dict[str, int] = {}  # Each format's JSON -> its index.
+    offset = 0
+    for name, data, fmt in memories:
+        key = json.dumps(fmt, sort_keys=True)
+        if key not in format_ids:
+            format_ids[key] = len(formats)
+            formats.append(fmt)
+        size = elem_size(int(fmt["width"]))
+        pad = -offset % size
+        out.write(bytes(pad))
+        offset += pad
+        out.write(pack(data, size))
+        entries.append(
+            {
+                "name": name,
+                "offset": offset,
+                "length": len(data),
+                "elem_size": size,
+                "format": format_ids[key],
+            }
+        )
+        offset += size * len(data)
+    return entries, formats
+
+
+def write_image(memories: Iterable[MemoryType], blob: str) -> None:
+    """Write `memories` as an image: the blob at `blob` and the manifest
+    next to it.
+    """
+    with open(blob, "wb") as out:
+        entries, formats = write_blob(memories, out)
+    manifest = {
+        "blob": os.path.basename(blob),
+        "formats": formats,
+        "memories": entries,
+    }
+    with open(manifest_path(blob), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+
+def read_manifest(path: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Read an image's manifest. Return the path of its blob and its
+    entries, with each entry's format looked up in the format table.
+    `path` may name either the blob or its manifest.
+    """
+    if not path.endswith(MANIFEST_EXT):
+        path = manifest_path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    blob = os.path.join(os.path.dirname(path), manifest["blob"])
+    formats = manifest["formats"]
+    entries = [
+        {**entry, "format": formats[entry["format"]]} for entry in manifest["memories"]
+    ]
+    return blob, entries
+
+
+def read_image(path: str) -> Iterator[MemoryType]:
+    """Yield the memories in an image, in the order they were written.
+    `path` may name either the blob or its manifest.
+    """
+    blob, entries = read_manifest(path)
+    with open(blob, "rb") as data:
+        for entry in entries:
+            size = entry["elem_size"]
+            data.seek(entry["offset"])
+            buf = data.read(size * entry["length"])
+            yield entry["name"], unpack(buf, size), entry["format"]
+
+
+def image_to_json(path: str, out: TextIO) -> None:
+    """Convert the image at `path` to the JSON data format."""
+    write_json(read_image(path), out)
+
+
+def depth_image(
+    graph: mygfa.Graph,
+    max_n: int,
+    max_e: int,
+    max_p: int,
+    subset_paths: List[str],
+    blob: str,
+    shared_ptc: bool = False,
+    pes: Optional[int] = None,
+) -> None:
+    """Like `depth.depth_stdout`, but writes an image to `blob`."""
+    max_n, max_e, max_p = get_dimensions(graph, max_n, max_e, max_p)
+    memories = depth_memories(graph, max_n, max_e, max_p, subset_paths, shared_ptc)
+    if pes is not None:
+        memories = bank_memories(memories, max_n, pes)
+    write_image(memories, blob)
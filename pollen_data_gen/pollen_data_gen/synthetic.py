@@ -0,0 +1,113 @@
+"""Generate synthetic pangenome graphs for scale testing.
+
+The graph is a chain of *sites*. Most sites hold a single segment, but a
+site is a *variant* (a bubble with two alternative segments) with
+probability `variants`. Each path walks a window of consecutive sites,
+picking one segment at each variant site, and traverses each step in
+reverse with probability `inversions`. The links between neighbouring
+sites are enough to make every such path valid.
+
+Output is written line by line as it is generated, so only a couple of
+small arrays (one entry per site) are held in memory. The same parameters
+and seed always produce the same file.
+"""
+
+import random
+from array import array
+from dataclasses import dataclass
+from typing import TextIO
+
+BASES = "ACGT"
+LINK_ORIS = [("+", "+"), ("+", "-"), ("-", "+"), ("-", "-")]
+
+
+@dataclass
+class Params:
+    """The knobs for a synthetic graph."""
+
+    segments: int = 1000
+    """The number of segments."""
+
+    paths: int = 10
+    """The number of paths."""
+
+    path_length: int = 0
+    """The number of sites each path crosses (0 means every site)."""
+
+    variants: float = 0.1
+    """The probability that a site is a bubble with two segments."""
+
+    inversions: float = 0.01
+    """The probability that a path step is traversed in reverse."""
+
+    seg_len: int = 8
+    """The mean segment length."""
+
+    seg_len_dist: str = "geometric"
+    """How segment lengths are distributed: fixed, uniform, or geometric."""
+
+    seed: int = 0
+
+
+def seg_length(rng: random.Random, params: Params) -> int:
+    """Draw a segment length from the configured distribution."""
+    if params.seg_len_dist == "fixed":
+        return params.seg_len
+    if params.seg_len_dist == "uniform":
+        return rng.randint(1, 2 * params.seg_len - 1)
+    if params.seg_len_dist == "geometric":
+        return 1 + int(rng.expovariate(1 / params.seg_len))
+    assert False, f"unknown segment length distribution {params.seg_len_dist}"
+
+
+def write_segments(out: TextIO, params: Params) -> "array[int]":
+    """Write the S-lines and return the id of the first segment at each
+    site, followed by one past the last segment id."""
+    rng = random.Random(f"{params.seed}:segments")
+    starts = array("q")
+    seg_id = 1
+    while seg_id <= params.segments:
+        starts.append(seg_id)
+        alleles = 2 if rng.random() < params.variants else 1
+        for _ in range(min(alleles, params.segments - seg_id + 1)):
+            seq = "".join(rng.choices(BASES, k=seg_length(rng, params)))
+            out.write(f"S\t{seg_id}\t{seq}\n")
+            seg_id += 1
+    starts.append(seg_id)
+    return starts
+
+
+def write_paths(out: TextIO, params: Params, starts: "array[int]") -> None:
+    """Write the P-lines, one step at a time."""
+    rng = random.Random(f"{params.seed}:paths")
+    nsites = len(starts) - 1
+    if nsites == 0:
+        return
+    length = min(params.path_length or nsites, nsites)
+    for i in range(params.paths):
+        first = rng.randrange(nsites - length + 1)
+        out.write(f"P\tpath{i}\t")
+        for site in range(first, first + length):
+            seg_id = starts[site] + rng.randrange(starts[site + 1] - starts[site])
+            ori = "-" if rng.random() < params.inversions else "+"
+            sep = "," if site + 1 < first + length else "\t*\n"
+            out.write(f"{seg_id}{ori}{sep}")
+
+
+def write_links(out: TextIO, params: Params, starts: "array[int]") -> None:
+    """Write the L-lines, linking every segment at a site to every segment
+    at the next site (in every orientation, if paths may invert steps)."""
+    oris = LINK_ORIS if params.inversions > 0 else LINK_ORIS[:1]
+    for site in range(len(starts) - 2):
+        for from_ in range(starts[site], starts[site + 1]):
+            for to in range(starts[site + 1], starts[site + 2]):
+                for from_ori, to_ori in oris:
+                    out.write(f"L\t{from_}\t{from_ori}\t{to}\t{to_ori}\t0M\n")
+
+
+def generate(out: TextIO, params: Params) -> None:
+    """Write a synthetic GFA file."""
+    out.write("H\tVN:Z:1.0\n")
+    starts = write_segments(out, params)
+    write_paths(out, params, starts)
+    write_links(out, params, starts)
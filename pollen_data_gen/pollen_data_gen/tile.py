@@ -0,0 +1,221 @@
+"""Split a graph that is too big for a node depth accelerator into tiles.
+
+An accelerator has `max_n` node slots, each with room for `max_e` steps
+whose path ids are at most `max_p`. A tile fills those slots with consecutive
+nodes of the graph. A node with too many steps takes several slots (maybe
+in different tiles), each with a *chunk* of its steps, and its depth is
+the sum of its chunks' depths.
+
+Uniq depth does not simply add up: a path that has steps in two chunks
+would be counted twice. So each node's steps are sorted by path, which
+keeps a path's steps together, and the plan records, for each node, how
+many extra times its paths get counted. The reduction subtracts that.
+
+Path ids are local to a tile: each tile numbers the paths that cross it
+from 1, so that a graph may have more than `max_p` paths as long as no
+tile sees more than that many. Steps on paths that are not considered
+contribute nothing to either depth, so they are left out altogether and
+every tile's `paths_to_consider` is all ones.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import mygfa
+import mygfa.preprocess
+
+from .depth import MemoryType, bank_memories, format_gen, write_json
+from .image import write_image
+
+# A node's name and the (global) path ids of its steps.
+NodePaths = Tuple[str, List[int]]
+
+
+class TileError(Exception):
+    """Raised when the accelerator is too small for any tiling."""
+
+
+@dataclass
+class Tile:
+    """One accelerator's worth of the graph."""
+
+    nodes: List[str] = field(default_factory=list)
+    """The node that each slot's steps belong to."""
+
+    steps: List[List[int]] = field(default_factory=list)
+    """Each slot's path ids, numbered locally from 1."""
+
+    paths: Dict[int, int] = field(default_factory=dict)
+    """Map from global path ids to this tile's local ones."""
+
+
+@dataclass
+class Plan:
+    """A tiling of a graph, and what is needed to put the results back
+    together."""
+
+    nodes: List[str]
+    """Every node in the graph, in output order."""
+
+    tiles: List[Tile]
+
+    corrections: Dict[str, int]
+    """How many more paths a node's chunks count than it really has."""
+
+
+def chunks(path_ids: List[int], max_e: int, max_p: int) -> List[List[int]]:
+    """Split a node's steps into chunks of at most `max_e` steps on at most
+    `max_p` distinct paths. Steps are sorted so that each path's steps are
+    contiguous and a path is split across as few chunks as possible.
+    """
+    out: List[List[int]] = []
+    chunk: List[int] = []
+    distinct = 0
+    for path_id in sorted(path_ids):
+        new_path = not chunk or chunk[-1] != path_id
+        if chunk and (len(chunk) == max_e or (new_path and distinct == max_p)):
+            out.append(chunk)
+            chunk, distinct = [], 0
+            new_path = True
+        chunk.append(path_id)
+        distinct += new_path
+    if chunk:
+        out.append(chunk)
+    return out
+
+
+def plan(node_paths: Iterable[NodePaths], max_n: int, max_e: int, max_p: int) -> Plan:
+    """Pack the nodes' steps, in order, into as few tiles as a greedy pass
+    can manage.
+    """
+    if max_n < 1 or max_e < 1 or max_p < 1:
+        raise TileError(f"cannot tile for dimensions {max_n}, {max_e}, {max_p}")
+
+    nodes = []
+    tiles = [Tile()]
+    corrections = {}
+    for node, path_ids in node_paths:
+        nodes.append(node)
+        node_chunks = chunks(path_ids, max_e, max_p) or [[]]
+        extra = sum(len(set(c)) for c in node_chunks) - len(set(path_ids))
+        if extra:
+            corrections[node] = extra
+
+        for chunk in node_chunks:
+            tile = tiles[-1]
+            new_paths = set(chunk) - tile.paths.keys()
+            if len(tile.nodes) == max_n or len(tile.paths) + len(new_paths) > max_p:
+                tile = Tile()
+                tiles.append(tile)
+            for path_id in sorted(set(chunk)):
+                tile.paths.setdefault(path_id, len(tile.paths) + 1)
+            tile.nodes.append(node)
+            tile.steps.append([tile.paths[p] for p in chunk])
+
+    if not tiles[-1].nodes:
+        tiles.pop()
+    return Plan(nodes, tiles, corrections)
+
+
+def tile_memories(
+    tile: Tile, max_n: int, max_e: int, max_p: int, shared_ptc: bool = False
+) -> Iterator[MemoryType]:
+    """Yield a tile's accelerator input, in the same layout as
+    `depth.depth_memories`.
+    """
+    ids_format = format_gen(max_p.bit_length())
+    memories: List[MemoryType] = [
+        ("depth_output", [0] * max_n, format_gen(max_e.bit_length())),
+        ("uniq_output", [0] * max_n, format_gen(max_p.bit_length())),
+    ]
+    for i in range(1, max_n + 1):
+        steps = tile.steps[i - 1] if i <= len(tile.steps) else []
+        memories.append(
+            (f"path_ids{i}", steps + [0] * (max_e - len(steps)), ids_format)
+        )
+
+    consider = [0] + [1] * max_p
+    if shared_ptc:
+        memories.append(("paths_to_consider", consider, format_gen(1)))
+    else:
+        for i in range(1, max_n + 1):
+            memories.append((f"paths_to_consider{i}", consider, format_gen(1)))
+    return iter(sorted(memories, key=lambda m: m[0]))
+
+
+def reduce(
+    tiling: Plan, outputs: Sequence[Tuple[Sequence[int], Sequence[int]]]
+) -> List[Tuple[str, int, int]]:
+    """Combine each tile's depth and uniq outputs, in tile order, into a
+    (node, depth, uniq) row for every node in the graph.
+    """
+    assert len(outputs) == len(tiling.tiles), "need one output per tile"
+    depths = {node: 0 for node in tiling.nodes}
+    uniqs = {node: -tiling.corrections.get(node, 0) for node in tiling.nodes}
+    for tile, (tile_depths, tile_uniqs) in zip(tiling.tiles, outputs):
+        for slot, node in enumerate(tile.nodes):
+            depths[node] += tile_depths[slot]
+            uniqs[node] += tile_uniqs[slot]
+    return [(node, depths[node], uniqs[node]) for node in tiling.nodes]
+
+
+def write_tiles(
+    tiling: Plan,
+    prefix: str,
+    max_n: int,
+    max_e: int,
+    max_p: int,
+    shared_ptc: bool = False,
+    binary: bool = False,
+    pes: Optional[int] = None,
+) -> List[str]:
+    """Write each tile's input to `{prefix}.tile{k}.data` (or `.bin`, as a
+    memory image), and the plan to `{prefix}.tiles.json`. Return the tiles'
+    filenames.
+    """
+    files = []
+    for k, tile in enumerate(tiling.tiles):
+        memories = tile_memories(tile, max_n, max_e, max_p, shared_ptc)
+        if pes is not None:
+            memories = bank_memories(memories, max_n, pes)
+        if binary:
+            filename = f"{prefix}.tile{k}.bin"
+            write_image(memories, filename)
+        else:
+            filename = f"{prefix}.tile{k}.data"
+            with open(filename, "w", encoding="utf-8") as out:
+                write_json(memories, out)
+        files.append(filename)
+
+    with open(f"{prefix}.tiles.json", "w", encoding="utf-8") as out:
+        json.dump(
+            {
+                "dimensions": [max_n, max_e, max_p],
+                "nodes": tiling.nodes,
+                "corrections": tiling.corrections,
+                "tiles": [
+                    {"file": os.path.basename(f), "nodes": tile.nodes}
+                    for f, tile in zip(files, tiling.tiles)
+                ],
+            },
+            out,
+        )
+    return files
+
+
+def graph_node_paths(
+    graph: mygfa.Graph, subset_paths: Optional[List[str]]
+) -> Iterator[NodePaths]:
+    """The path ids of each segment's steps, leaving out steps on paths
+    that are not in `subset_paths` (if given).
+    """
+    path2id = {path: id for id, path in enumerate(graph.paths, start=1)}
+    considered = set(subset_paths) if subset_paths else None
+    crossings = mygfa.preprocess.node_steps(graph)
+    for seg in graph.segments:
+        yield seg, [
+            path2id[c[0]]
+            for c in crossings[seg]
+            if considered is None or c[0] in considered
+        ]
@@ -1,6 +1,14 @@
 import argparse
 
 
+def positive_int(value):
+    """An argparse type for arguments that must be positive integers"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
 class store_const_and_arg(argparse.Action):
     """
     An argparse action which stores a constant and stores the argument(s)
@@ -0,0 +1,52 @@
+"""
+The accelerator generator's commandline options. They live apart from
+calyx_depth.py so that the commands that never generate an accelerator
+(parsing data, tiling, and simulating with NumPy) do not need Calyx.
+"""
+
+from pollen.argparse_custom import positive_int
+
+
+def config_parser(parser):
+    parser.add_argument(
+        "-a",
+        "--auto-size",
+        help="Provide a graph (.og, .gfa, or .flatgfa) that will be used to calculate the hardware dimensions.",
+    )
+    parser.add_argument(
+        "-n",
+        "--max-nodes",
+        type=int,
+        help="Specify the maximum number of nodes that the hardware can support.",
+    )
+    parser.add_argument(
+        "-e",
+        "--max-steps",
+        type=int,
+        help="Specify the maximum number of steps per node that the hardware can support.",
+    )
+    parser.add_argument(
+        "-p",
+        "--max-paths",
+        type=int,
+        help="Specify the maximum number of paths that the hardware can support.",
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        help="Specify the output file. If not specified, will dump to stdout.",
+    )
+    parser.add_argument(
+        "--shared-ptc",
+        action="store_true",
+        help="Read a single external paths_to_consider memory shared by all "
+        "nodes. This only shrinks the input: the accelerator still copies it "
+        "into an internal memory for each node (or each PE, with --pes) "
+        "before it starts, so it uses as much on-chip memory as before.",
+    )
+    parser.add_argument(
+        "--pes",
+        type=positive_int,
+        help="Generate an accelerator with this many processing elements, each "
+        "of which handles a bank of nodes in turn, instead of one per node.",
+    )
@@ -0,0 +1,385 @@
+"""
+Compute node depth for a whole collection of graphs at once.
+
+The input is a manifest that lists one graph per line, optionally followed
+by a file of paths to consider for it. Graphs are sorted into dimension
+classes: each dimension is rounded up to the largest number of the same bit
+width, which leaves the widths of every memory unchanged, and one
+accelerator is generated (or taken from the cache) per class. A pool of
+processes loads the graphs, writes their accelerator inputs, and generates
+each class's accelerator as soon as one of its graphs is loaded. The
+simulations run concurrently, at most --sim-jobs at a time, as soon as
+each graph's input and accelerator are ready.
+
+Each graph's node depth table goes to the output directory, named after
+the graph, along with summary.json, which records how long each stage took
+for each graph and for the batch as a whole.
+"""
+
+import argparse
+import json
+import os
+import os.path
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import pollen.depth.cache as cache
+import pollen.depth.parse_data as parse_data
+import pollen.depth.simulate as simulate
+from pollen.depth.main import fud_command
+from pollen_data_gen import image
+import pollen_data_gen.depth as depth_gen
+from pollen.argparse_custom import positive_int
+
+SUMMARY_FILE = "summary.json"
+STAGES = ["load", "data", "generate", "simulate"]
+
+
+def read_manifest(filename):
+    """
+    Read a manifest: one graph per line, optionally followed by a file
+    listing the paths to consider. Blank lines and lines starting with #
+    are skipped, and relative paths are relative to the manifest. Return a
+    list of (graph, subset_paths) pairs.
+    """
+
+    base = os.path.dirname(os.path.abspath(filename))
+    entries = []
+    with open(filename, "r", encoding="utf-8") as manifest:
+        for line_num, line in enumerate(manifest, start=1):
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            if len(fields) > 2:
+                raise ValueError(
+                    f"{filename}:{line_num}: expected a graph and at most one "
+                    "paths file"
+                )
+            files = [os.path.join(base, field) for field in fields]
+            entries.append((files[0], files[1] if len(files) > 1 else None))
+    return entries
+
+
+def graph_name(filename):
+    """The name of a graph's outputs: its file name without the extension"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def dimension_class(max_nodes, max_steps, max_paths):
+    """
+    The dimensions of the accelerator for a graph with these dimensions:
+    each one rounded up to the largest number with the same bit width
+    """
+    return tuple(
+        (1 << max(dim.bit_length(), 1)) - 1 for dim in (max_nodes, max_steps, max_paths)
+    )
+
+
+def class_name(dims):
+    return "x".join(str(dim) for dim in dims)
+
+
+def prepare(filename, subset_paths, data_file, binary, shared_ptc, pes):
+    """
+    Load a graph and write the input for its dimension class's accelerator
+    to data_file. Return the graph's node count, the class's dimensions,
+    and the time spent loading the graph and writing its data. This runs in
+    a worker process, and loads the graph only once.
+    """
+
+    start = time.perf_counter()
+    num_nodes, max_steps, max_paths = parse_data.get_maxes(filename)
+    dims = dimension_class(num_nodes, max_steps, max_paths)
+    loaded = time.perf_counter()
+
+    data = parse_data.parse_odgi(filename, subset_paths, *dims, shared_ptc)
+    memories = parse_data.to_memories(data)
+    if pes is not None:
+        memories = depth_gen.bank_memories(memories, dims[0], pes)
+    if binary:
+        image.write_image(memories, data_file)
+    else:
+        with open(data_file, "w", encoding="utf-8") as out:
+            depth_gen.write_json(memories, out)
+    done = time.perf_counter()
+
+    return num_nodes, dims, {"load": loaded - start, "data": done - loaded}
+
+
+def run_simulation(sim, futil_file, data_file):
+    """
+    Simulate an accelerator on its input. Return the output memories, in
+    the Calyx interpreter's form, and the time the simulation took.
+    """
+    start = time.perf_counter()
+    if sim == "numpy":
+        calyx_out = simulate.simulate_file(data_file)
+    else:
+        fud_out = subprocess.run(
+            fud_command(futil_file, data_file), capture_output=True, text=True
+        )
+        try:
+            calyx_out = json.loads(fud_out.stdout)
+        except ValueError:
+            raise RuntimeError(fud_out.stderr) from None
+    return calyx_out, time.perf_counter() - start
+
+
+def config_parser(parser):
+    """Configure the commandline argument parser"""
+    parser.add_argument(
+        "manifest",
+        help="A file listing one graph (.og, .gfa, or .flatgfa) per line, "
+        "optionally followed by a file of paths to consider for it.",
+    )
+    parser.add_argument(
+        "-o",
+        "--out-dir",
+        required=True,
+        help="The directory to write each graph's node depth table "
+        "(<graph>.depth) and the timing summary to.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of processes that load graphs and write their inputs. "
+        "Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--sim-jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of simulations to run at once. Defaults to the number "
+        "of CPUs.",
+    )
+    parser.add_argument(
+        "--sim",
+        choices=["fud", "numpy"],
+        default="fud",
+        help="How to simulate the accelerators: with fud and the Calyx "
+        "interpreter (the default), or with the NumPy model of them.",
+    )
+    parser.add_argument(
+        "--shared-ptc",
+        action="store_true",
+        help="Use accelerators with a single external paths_to_consider "
+        "memory. This only shrinks their inputs, not their on-chip memory.",
+    )
+    parser.add_argument(
+        "--pes",
+        type=positive_int,
+        help="Use accelerators with this many processing elements.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always generate fresh accelerators instead of using the "
+        "accelerator cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="The accelerator cache's directory. Defaults to $POLLEN_CACHE_DIR, "
+        "or pollen/depth in the user's cache directory.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=cache.MAX_BYTES // 2**20,
+        help="The accelerator cache's size limit in MiB.",
+    )
+
+
+def generate(args, dims, tmp_dir_name):
+    """
+    Get the accelerator for a dimension class. Return its .futil file and
+    the time that took. This runs in a worker process.
+    """
+    start = time.perf_counter()
+    if args.no_cache:
+        # Calyx is only needed to generate accelerators.
+        import pollen.depth.calyx_depth as depth
+
+        futil_file = os.path.join(tmp_dir_name, f"{class_name(dims)}.futil")
+        program = depth.node_depth(*dims, args.shared_ptc, args.pes)
+        with open(futil_file, "w") as out_file:
+            out_file.write(program.doc())
+    else:
+        futil_file = cache.accelerator(
+            *dims,
+            cache_dir=args.cache_dir,
+            max_bytes=args.cache_size * 2**20,
+            shared_ptc=args.shared_ptc,
+            pes=args.pes,
+        )
+    return futil_file, time.perf_counter() - start
+
+
+def run_batch(args, tmp_dir_name):
+    """
+    Run every graph in the manifest, and return the summary of the batch
+    """
+
+    batch_start = time.perf_counter()
+    entries = read_manifest(args.manifest)
+    names = [graph_name(filename) for filename, _ in entries]
+    for name in names:
+        if names.count(name) > 1:
+            raise ValueError(f"More than one graph in the manifest is named {name}.")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    binary = args.sim == "numpy"  # The NumPy simulator reads images directly
+    ext = ".bin" if binary else ".data"
+
+    results = {
+        name: {"graph": filename, "status": "ok", "times": {}}
+        for name, (filename, _) in zip(names, entries)
+    }
+    classes = {}  # Dimensions -> class summary, with its .futil file
+    waiting = {}  # Dimensions -> the graphs waiting for its accelerator
+    failed = {}  # Dimensions -> why generating its accelerator failed
+    node_counts = {}  # Graph name -> node count
+    simulations = {}  # Graph name -> simulation future
+
+    with ProcessPoolExecutor(args.jobs) as data_pool, ThreadPoolExecutor(
+        args.sim_jobs
+    ) as sim_pool:
+
+        def simulate_graph(name, futil_file):
+            data_file = os.path.join(tmp_dir_name, name + ext)
+            simulations[name] = sim_pool.submit(
+                run_simulation, args.sim, futil_file, data_file
+            )
+
+        prepared = {
+            data_pool.submit(
+                prepare,
+                filename,
+                subset_paths,
+                os.path.join(tmp_dir_name, name + ext),
+                binary,
+                args.shared_ptc,
+                args.pes,
+            ): name
+            for name, (filename, subset_paths) in zip(names, entries)
+        }
+        generating = {}  # Generation future -> dimensions
+
+        # Generate each class's accelerator in the pool as soon as one of
+        # its graphs is ready, and start each graph's simulation as soon as
+        # both its input and its accelerator are ready.
+        pending = set(prepared)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in generating:
+                    dims = generating[future]
+                    try:
+                        futil_file, seconds = future.result()
+                    except Exception as exc:
+                        failed[dims] = f"generating: {exc}"
+                        for name in waiting.pop(dims):
+                            results[name].update(status="failed", error=failed[dims])
+                        continue
+                    classes[dims].update(generate=seconds, futil=futil_file)
+                    for name in waiting.pop(dims):
+                        simulate_graph(name, futil_file)
+                    continue
+
+                name = prepared[future]
+                result = results[name]
+                try:
+                    num_nodes, dims, times = future.result()
+                except Exception as exc:
+                    result.update(status="failed", error=f"preparing: {exc}")
+                    continue
+                result["times"].update(times)
+                result["dimensions"] = list(dims)
+                node_counts[name] = num_nodes
+
+                if dims not in classes:
+                    classes[dims] = {
+                        "dimensions": list(dims),
+                        "graphs": 0,
+                        "generate": 0.0,
+                        "futil": None,
+                    }
+                    if not binary:  # The NumPy simulator needs no accelerator
+                        waiting[dims] = []
+                        gen_future = data_pool.submit(
+                            generate, args, dims, tmp_dir_name
+                        )
+                        generating[gen_future] = dims
+                        pending.add(gen_future)
+                classes[dims]["graphs"] += 1
+
+                if dims in failed:
+                    result.update(status="failed", error=failed[dims])
+                elif dims in waiting:
+                    waiting[dims].append(name)
+                else:
+                    simulate_graph(name, classes[dims]["futil"])
+
+        for name, future in simulations.items():
+            result = results[name]
+            try:
+                calyx_out, result["times"]["simulate"] = future.result()
+            except Exception as exc:
+                result.update(status="failed", error=f"simulating: {exc}")
+                continue
+            result["output"] = os.path.join(args.out_dir, f"{name}.depth")
+            with open(result["output"], "w") as out_file:
+                out_file.write(
+                    parse_data.from_calyx(calyx_out, True, node_counts[name])
+                )
+                out_file.write("\n")
+
+    totals = {stage: 0.0 for stage in STAGES}
+    for result in results.values():
+        for stage, seconds in result["times"].items():
+            totals[stage] += seconds
+    for class_summary in classes.values():
+        del class_summary["futil"]
+        totals["generate"] += class_summary["generate"]
+    return {
+        "graphs": list(results.values()),
+        "classes": list(classes.values()),
+        "stages": totals,
+        "wall": time.perf_counter() - batch_start,
+    }
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp_dir_name:
+        summary = run_batch(args, tmp_dir_name)
+
+    with open(os.path.join(args.out_dir, SUMMARY_FILE), "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+    failed = [result for result in summary["graphs"] if result["status"] != "ok"]
+    print(f"{len(summary['graphs']) - len(failed)} graphs done, {len(failed)} failed")
+    for stage, seconds in summary["stages"].items():
+        print(f"{stage}\t{seconds:.3f}s")
+    print(f"wall\t{summary['wall']:.3f}s")
+    for result in failed:
+        print(f"{result['graph']}: {result['error']}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Parse commandline arguments
+    parser = argparse.ArgumentParser()
+    config_parser(parser)
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,139 @@
+"""
+A persistent cache of generated node depth accelerators.
+
+Generating the Calyx program for an accelerator only depends on its
+dimensions, its options, and the generator itself, so runs on graphs of
+similar size can share one. Each accelerator lives in its own directory,
+named after a hash of those things. When the cache grows past its size
+limit, the least recently used accelerators are evicted.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pollen
+import pollen_data_gen.depth as depth_gen
+
+# The default limit on the cache's total size, in bytes
+MAX_BYTES = 256 * 2**20
+
+FUTIL_FILE = "depth.futil"
+INFO_FILE = "info.json"
+
+
+def default_dir():
+    """
+    The cache directory: $POLLEN_CACHE_DIR if it is set, and otherwise
+    pollen/depth under the user's cache directory
+    """
+    if os.environ.get("POLLEN_CACHE_DIR"):
+        return os.environ["POLLEN_CACHE_DIR"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "pollen", "depth")
+
+
+def generator_version():
+    """
+    Identify the accelerator generator: the package version and a hash of
+    the generator's source, including the bank assignment it takes from
+    pollen_data_gen, so that any change to either invalidates the cache
+    """
+    sources = [
+        os.path.join(os.path.dirname(__file__), "calyx_depth.py"),
+        depth_gen.__file__,
+    ]
+    digest = hashlib.blake2b(digest_size=8)
+    for source in sources:
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    return f"{pollen.__version__}-{digest.hexdigest()}"
+
+
+def cache_key(max_nodes, max_steps, max_paths, **options):
+    """
+    The name of the cache entry for an accelerator with these dimensions
+    and generator options, and the information that the name hashes
+    """
+    info = {
+        "dimensions": [max_nodes, max_steps, max_paths],
+        "options": options,
+        "version": generator_version(),
+    }
+    text = json.dumps(info, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest(), info
+
+
+def entry_size(path):
+    """The total size of the files in a cache entry"""
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """
+    Remove the least recently used entries until the cache fits in
+    max_bytes. The entry named keep is never removed.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        futil = os.path.join(entry.path, FUTIL_FILE)
+        if entry.is_dir() and os.path.exists(futil):
+            entries.append(
+                (os.stat(futil).st_mtime, entry.name, entry_size(entry.path))
+            )
+
+    total = sum(size for _, _, size in entries)
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name != keep:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+            total -= size
+
+
+def accelerator(
+    max_nodes,
+    max_steps,
+    max_paths,
+    cache_dir=None,
+    max_bytes=MAX_BYTES,
+    **options,
+):
+    """
+    Return the path to a .futil file for the accelerator with these
+    dimensions and generator options, generating it only if it is not
+    already in the cache
+    """
+    cache_dir = cache_dir or default_dir()
+    key, info = cache_key(max_nodes, max_steps, max_paths, **options)
+    entry = os.path.join(cache_dir, key)
+    futil_file = os.path.join(entry, FUTIL_FILE)
+
+    if os.path.exists(futil_file):
+        os.utime(futil_file)  # Mark the entry as recently used
+        return futil_file
+
+    # Calyx is only needed to generate accelerators.
+    import pollen.depth.calyx_depth as depth
+
+    # Build the entry in a temporary directory, then move it into place,
+    # so that concurrent runs never see a partial entry.
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    try:
+        program = depth.node_depth(max_nodes, max_steps, max_paths, **options)
+        with open(os.path.join(tmp, FUTIL_FILE), "w") as out_file:
+            out_file.write(program.doc())
+        with open(os.path.join(tmp, INFO_FILE), "w") as info_file:
+            json.dump(info, info_file)
+        try:
+            os.rename(tmp, entry)
+        except OSError:  # Another run added the same entry first
+            pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    evict(cache_dir, max_bytes, keep=key)
+    return futil_file
@@ -2,7 +2,8 @@ import argparse
 import subprocess
 
 from calyx.py_ast import *
-from . import parse_data
+from pollen_data_gen.depth import pe_banks
+from . import accel_args, parse_data
 
 # from mygfa import mygfa, preprocess
 
@@ -13,7 +14,227 @@ MAX_STEPS = 15
 MAX_PATHS = 15
 
 
-def node_depth(max_nodes, max_steps, max_paths):
+def shared_ptc_cells(stdlib, ptc_size, path_id_width):
+    """
+    The cells for a paths_to_consider memory shared by every node, and for
+    copying it into each node's own memory. Every node still needs its own
+    copy, since a memory has a single read port and the nodes run in
+    parallel, so this saves input data but no on-chip memory.
+    """
+    return [
+        Cell(
+            CompVar("paths_to_consider"),
+            stdlib.mem_d1(1, ptc_size, path_id_width),
+            is_external=True,
+        ),
+        Cell(CompVar("ptc_val"), stdlib.register(1)),
+        Cell(CompVar("ptc_idx"), stdlib.register(path_id_width)),
+        Cell(
+            CompVar("ptc_idx_adder"),
+            stdlib.op("add", path_id_width, signed=False),
+        ),
+        Cell(
+            CompVar("ptc_idx_neq"),
+            stdlib.op("neq", path_id_width, signed=False),
+        ),
+    ]
+
+
+def shared_ptc_wires(copies, path_id_width, max_paths):
+    """
+    The groups that copy the shared paths_to_consider memory into each of
+    the memories in copies
+    """
+    ptc_idx = CompVar("ptc_idx")
+    ptc_val = CompVar("ptc_val")
+    wires = [
+        Group(
+            CompVar("init_ptc_idx"),
+            [
+                Connect(CompPort(ptc_idx, "in"), ConstantPort(path_id_width, 0)),
+                Connect(CompPort(ptc_idx, "write_en"), ConstantPort(1, 1)),
+                Connect(
+                    HolePort(CompVar("init_ptc_idx"), "done"),
+                    CompPort(ptc_idx, "done"),
+                ),
+            ],
+        ),
+        Group(
+            CompVar("load_ptc"),
+            [
+                Connect(
+                    CompPort(CompVar("paths_to_consider"), "addr0"),
+                    CompPort(ptc_idx, "out"),
+                ),
+                Connect(
+                    CompPort(ptc_val, "in"),
+                    CompPort(CompVar("paths_to_consider"), "read_data"),
+                ),
+                Connect(CompPort(ptc_val, "write_en"), ConstantPort(1, 1)),
+                Connect(
+                    HolePort(CompVar("load_ptc"), "done"),
+                    CompPort(ptc_val, "done"),
+                ),
+            ],
+        ),
+        Group(
+            CompVar("inc_ptc_idx"),
+            [
+                Connect(
+                    CompPort(CompVar("ptc_idx_adder"), "left"),
+                    CompPort(ptc_idx, "out"),
+                ),
+                Connect(
+                    CompPort(CompVar("ptc_idx_adder"), "right"),
+                    ConstantPort(path_id_width, 1),
+                ),
+                Connect(
+                    CompPort(ptc_idx, "in"),
+                    CompPort(CompVar("ptc_idx_adder"), "out"),
+                ),
+                Connect(CompPort(ptc_idx, "write_en"), ConstantPort(1, 1)),
+                Connect(
+                    HolePort(CompVar("inc_ptc_idx"), "done"),
+                    CompPort(ptc_idx, "done"),
+                ),
+            ],
+        ),
+        CombGroup(
+            CompVar("compare_ptc_idx"),
+            [
+                Connect(
+                    CompPort(CompVar("ptc_idx_neq"), "left"),
+                    CompPort(ptc_idx, "out"),
+                ),
+                Connect(
+                    CompPort(CompVar("ptc_idx_neq"), "right"),
+                    ConstantPort(path_id_width, max_paths),
+                ),
+            ],
+        ),
+    ]
+
+    for i, memory in enumerate(copies):
+        wires.append(
+            Group(
+                CompVar(f"copy_ptc{i}"),
+                [
+                    Connect(
+                        CompPort(memory, "addr0"),
+                        CompPort(ptc_idx, "out"),
+                    ),
+                    Connect(
+                        CompPort(memory, "write_data"),
+                        CompPort(ptc_val, "out"),
+                    ),
+                    Connect(
+                        CompPort(memory, "write_en"),
+                        ConstantPort(1, 1),
+                    ),
+                    Connect(
+                        HolePort(CompVar(f"copy_ptc{i}"), "done"),
+                        CompPort(memory, "done"),
+                    ),
+                ],
+            )
+        )
+    return wires
+
+
+def shared_ptc_control(num_copies):
+    """
+    Copy the shared paths_to_consider into num_copies memories: for each
+    path id, read the shared bit once and write it to every copy at once
+    """
+    copy_ptc = ParComp([Enable(f"copy_ptc{i}") for i in range(num_copies)])
+    return SeqComp(
+        [
+            Enable("init_ptc_idx"),
+            While(
+                CompPort(CompVar("ptc_idx_neq"), "out"),
+                CompVar("compare_ptc_idx"),
+                SeqComp([Enable("load_ptc"), copy_ptc, Enable("inc_ptc_idx")]),
+            ),
+            Enable("load_ptc"),
+            copy_ptc,
+        ]
+    )
+
+
+def write_reg(group, reg, value):
+    """A group that writes value to the register reg"""
+    return Group(
+        CompVar(group),
+        [
+            Connect(CompPort(reg, "in"), value),
+            Connect(CompPort(reg, "write_en"), ConstantPort(1, 1)),
+            Connect(HolePort(CompVar(group), "done"), CompPort(reg, "done")),
+        ],
+    )
+
+
+def update_reg(group, reg, adder, width, amount):
+    """A group that adds (or subtracts) amount to the register reg"""
+    return Group(
+        CompVar(group),
+        [
+            Connect(CompPort(adder, "left"), CompPort(reg, "out")),
+            Connect(CompPort(adder, "right"), ConstantPort(width, amount)),
+            Connect(CompPort(reg, "in"), CompPort(adder, "out")),
+            Connect(CompPort(reg, "write_en"), ConstantPort(1, 1)),
+            Connect(HolePort(CompVar(group), "done"), CompPort(reg, "done")),
+        ],
+    )
+
+
+def write_mem(group, mem, addr, value):
+    """A group that writes value to mem[addr]"""
+    return Group(
+        CompVar(group),
+        [
+            Connect(CompPort(mem, "addr0"), addr),
+            Connect(CompPort(mem, "write_data"), value),
+            Connect(CompPort(mem, "write_en"), ConstantPort(1, 1)),
+            Connect(HolePort(CompVar(group), "done"), CompPort(mem, "done")),
+        ],
+    )
+
+
+def load_mem(group, reg, mem, addr):
+    """A group that reads mem[addr] into the register reg"""
+    return Group(
+        CompVar(group),
+        [
+            Connect(CompPort(mem, "addr0"), addr),
+            Connect(CompPort(reg, "in"), CompPort(mem, "read_data")),
+            Connect(CompPort(reg, "write_en"), ConstantPort(1, 1)),
+            Connect(HolePort(CompVar(group), "done"), CompPort(reg, "done")),
+        ],
+    )
+
+
+def compare(group, neq, reg, width, value):
+    """A combinational group that compares the register reg to value"""
+    return CombGroup(
+        CompVar(group),
+        [
+            Connect(CompPort(neq, "left"), CompPort(reg, "out")),
+            Connect(CompPort(neq, "right"), ConstantPort(width, value)),
+        ],
+    )
+
+
+def node_depth(max_nodes, max_steps, max_paths, shared_ptc=False, pes=None):
+    """
+    Generate the node depth accelerator. If shared_ptc is set, the input has
+    a single paths_to_consider memory, which is copied into each node's own
+    (internal) copy before the computation starts. If pes is set, generate
+    an accelerator with that many processing elements (see node_depth_pes)
+    instead of one for each node.
+    """
+    if pes is not None:
+        return node_depth_pes(max_nodes, max_steps, max_paths, pes, shared_ptc)
+
     stdlib = Stdlib()
 
     # Variable identifiers
@@ -93,6 +314,9 @@ def node_depth(max_nodes, max_steps, max_paths):
         ),
     ]
 
+    if shared_ptc:
+        cells.extend(shared_ptc_cells(stdlib, ptc_size, path_id_width))
+
     for i in range(max_nodes):
         cells.extend(
             [
@@ -105,7 +329,7 @@ def node_depth(max_nodes, max_steps, max_paths):
                 Cell(
                     paths_to_consider[i],
                     stdlib.mem_d1(1, ptc_size, path_id_width),
-                    is_external=True,
+                    is_external=not shared_ptc,
                 ),
                 # Idx cells
                 Cell(path_id_reg[i], stdlib.register(path_id_width)),
@@ -133,87 +357,29 @@ def node_depth(max_nodes, max_steps, max_paths):
     # Initialize the wires
     wires = []
 
+    if shared_ptc:
+        wires.extend(shared_ptc_wires(paths_to_consider, path_id_width, max_paths))
+
     for i in range(max_nodes):
         wires.extend(
             [
-                Group(
-                    CompVar(f"init_idx{i}"),
-                    [
-                        Connect(CompPort(idx[i], "in"), ConstantPort(steps_width, 0)),
-                        Connect(CompPort(idx[i], "write_en"), ConstantPort(1, 1)),
-                        Connect(
-                            HolePort(CompVar(f"init_idx{i}"), "done"),
-                            CompPort(idx[i], "done"),
-                        ),
-                    ],
-                ),
-                Group(
-                    CompVar(f"load_path_id{i}"),
-                    [
-                        Connect(
-                            CompPort(path_ids[i], "addr0"), CompPort(idx[i], "out")
-                        ),
-                        Connect(
-                            CompPort(path_id_reg[i], "in"),
-                            CompPort(path_ids[i], "read_data"),
-                        ),
-                        Connect(
-                            CompPort(path_id_reg[i], "write_en"), ConstantPort(1, 1)
-                        ),
-                        Connect(
-                            HolePort(CompVar(f"load_path_id{i}"), "done"),
-                            CompPort(path_id_reg[i], "done"),
-                        ),
-                    ],
-                ),
-                Group(
-                    CompVar(f"inc_idx{i}"),
-                    [
-                        Connect(
-                            CompPort(idx_adder[i], "left"), CompPort(idx[i], "out")
-                        ),
-                        Connect(
-                            CompPort(idx_adder[i], "right"),
-                            ConstantPort(steps_width, 1),
-                        ),
-                        Connect(CompPort(idx[i], "in"), CompPort(idx_adder[i], "out")),
-                        Connect(CompPort(idx[i], "write_en"), ConstantPort(1, 1)),
-                        Connect(
-                            HolePort(CompVar(f"inc_idx{i}"), "done"),
-                            CompPort(idx[i], "done"),
-                        ),
-                    ],
+                write_reg(f"init_idx{i}", idx[i], ConstantPort(steps_width, 0)),
+                load_mem(
+                    f"load_path_id{i}",
+                    path_id_reg[i],
+                    path_ids[i],
+                    CompPort(idx[i], "out"),
                 ),
-                CombGroup(
-                    CompVar(f"compare_idx{i}"),
-                    [
-                        Connect(CompPort(idx_neq[i], "left"), CompPort(idx[i], "out")),
-                        Connect(
-                            CompPort(idx_neq[i], "right"),
-                            ConstantPort(steps_width, max_steps - 1),
-                        ),
-                    ],
+                update_reg(f"inc_idx{i}", idx[i], idx_adder[i], steps_width, 1),
+                compare(
+                    f"compare_idx{i}", idx_neq[i], idx[i], steps_width, max_steps - 1
                 ),
                 # Node depth wires
-                Group(
-                    CompVar(f"load_consider_path{i}"),
-                    [
-                        Connect(
-                            CompPort(paths_to_consider[i], "addr0"),
-                            CompPort(path_id_reg[i], "out"),
-                        ),
-                        Connect(
-                            CompPort(depth_temp[i], "in"),
-                            CompPort(paths_to_consider[i], "read_data"),
-                        ),
-                        Connect(
-                            CompPort(depth_temp[i], "write_en"), ConstantPort(1, 1)
-                        ),
-                        Connect(
-                            HolePort(CompVar(f"load_consider_path{i}"), "done"),
-                            CompPort(depth_temp[i], "done"),
-                        ),
-                    ],
+                load_mem(
+                    f"load_consider_path{i}",
+                    depth_temp[i],
+                    paths_to_consider[i],
+                    CompPort(path_id_reg[i], "out"),
                 ),
                 Group(
                     CompVar(f"inc_depth{i}"),
@@ -239,131 +405,49 @@ def node_depth(max_nodes, max_steps, max_paths):
                         ),
                     ],
                 ),
-                Group(
-                    CompVar(f"store_depth{i}"),
-                    [
-                        Connect(
-                            CompPort(depth_output, "addr0"), ConstantPort(node_width, i)
-                        ),
-                        Connect(
-                            CompPort(depth_output, "write_data"),
-                            CompPort(depth[i], "out"),
-                        ),
-                        Connect(CompPort(depth_output, "write_en"), ConstantPort(1, 1)),
-                        Connect(
-                            HolePort(CompVar(f"store_depth{i}"), "done"),
-                            CompPort(depth_output, "done"),
-                        ),
-                    ],
+                write_mem(
+                    f"store_depth{i}",
+                    depth_output,
+                    ConstantPort(node_width, i),
+                    CompPort(depth[i], "out"),
                 ),
                 # Uniq node depth wires
-                Group(
-                    CompVar(f"init_uniq_idx{i}"),
-                    [
-                        Connect(
-                            CompPort(uniq_idx[i], "in"),
-                            ConstantPort(uniq_width, max_paths),
-                        ),
-                        Connect(CompPort(uniq_idx[i], "write_en"), ConstantPort(1, 1)),
-                        Connect(
-                            HolePort(CompVar(f"init_uniq_idx{i}"), "done"),
-                            CompPort(uniq_idx[i], "done"),
-                        ),
-                    ],
+                write_reg(
+                    f"init_uniq_idx{i}",
+                    uniq_idx[i],
+                    ConstantPort(uniq_width, max_paths),
                 ),
-                CombGroup(
-                    CompVar(f"compare_uniq_idx{i}"),
-                    [
-                        Connect(
-                            CompPort(uniq_idx_neq[i], "left"),
-                            CompPort(uniq_idx[i], "out"),
-                        ),
-                        Connect(
-                            CompPort(uniq_idx_neq[i], "right"),
-                            ConstantPort(path_id_width, 0),
-                        ),
-                    ],
+                compare(
+                    f"compare_uniq_idx{i}",
+                    uniq_idx_neq[i],
+                    uniq_idx[i],
+                    path_id_width,
+                    0,
                 ),
-                Group(
-                    CompVar(f"dec_uniq_idx{i}"),
-                    [
-                        Connect(
-                            CompPort(uniq_idx_adder[i], "left"),
-                            CompPort(uniq_idx[i], "out"),
-                        ),
-                        Connect(
-                            CompPort(uniq_idx_adder[i], "right"),
-                            ConstantPort(path_id_width, 1),
-                        ),
-                        Connect(
-                            CompPort(uniq_idx[i], "in"),
-                            CompPort(uniq_idx_adder[i], "out"),
-                        ),
-                        Connect(CompPort(uniq_idx[i], "write_en"), ConstantPort(1, 1)),
-                        Connect(
-                            HolePort(CompVar(f"dec_uniq_idx{i}"), "done"),
-                            CompPort(uniq_idx[i], "done"),
-                        ),
-                    ],
+                update_reg(
+                    f"dec_uniq_idx{i}",
+                    uniq_idx[i],
+                    uniq_idx_adder[i],
+                    path_id_width,
+                    1,
                 ),
-                Group(
-                    CompVar(f"update_pon{i}"),  # update paths_on_node
-                    [
-                        Connect(
-                            CompPort(paths_on_node[i], "addr0"),
-                            CompPort(path_id_reg[i], "out"),
-                        ),
-                        Connect(
-                            CompPort(paths_on_node[i], "write_data"), ConstantPort(1, 1)
-                        ),
-                        Connect(
-                            CompPort(paths_on_node[i], "write_en"), ConstantPort(1, 1)
-                        ),
-                        Connect(
-                            HolePort(CompVar(f"update_pon{i}"), "done"),
-                            CompPort(paths_on_node[i], "done"),
-                        ),
-                    ],
+                write_mem(  # update paths_on_node
+                    f"update_pon{i}",
+                    paths_on_node[i],
+                    CompPort(path_id_reg[i], "out"),
+                    ConstantPort(1, 1),
                 ),
-                Group(
-                    CompVar(f"load_and_l{i}"),
-                    [
-                        Connect(
-                            CompPort(paths_on_node[i], "addr0"),
-                            CompPort(uniq_idx[i], "out"),
-                        ),
-                        Connect(
-                            CompPort(uniq_and_reg_l[i], "in"),
-                            CompPort(paths_on_node[i], "read_data"),
-                        ),
-                        Connect(
-                            CompPort(uniq_and_reg_l[i], "write_en"), ConstantPort(1, 1)
-                        ),
-                        Connect(
-                            HolePort(CompVar(f"load_and_l{i}"), "done"),
-                            CompPort(uniq_and_reg_l[i], "done"),
-                        ),
-                    ],
+                load_mem(
+                    f"load_and_l{i}",
+                    uniq_and_reg_l[i],
+                    paths_on_node[i],
+                    CompPort(uniq_idx[i], "out"),
                 ),
-                Group(
-                    CompVar(f"load_and_r{i}"),
-                    [
-                        Connect(
-                            CompPort(paths_to_consider[i], "addr0"),
-                            CompPort(uniq_idx[i], "out"),
-                        ),
-                        Connect(
-                            CompPort(uniq_and_reg_r[i], "in"),
-                            CompPort(paths_to_consider[i], "read_data"),
-                        ),
-                        Connect(
-                            CompPort(uniq_and_reg_r[i], "write_en"), ConstantPort(1, 1)
-                        ),
-                        Connect(
-                            HolePort(CompVar(f"load_and_r{i}"), "done"),
-                            CompPort(uniq_and_reg_r[i], "done"),
-                        ),
-                    ],
+                load_mem(
+                    f"load_and_r{i}",
+                    uniq_and_reg_r[i],
+                    paths_to_consider[i],
+                    CompPort(uniq_idx[i], "out"),
                 ),
                 Group(
                     CompVar(f"inc_uniq{i}"),
@@ -396,22 +480,11 @@ def node_depth(max_nodes, max_steps, max_paths):
                         ),
                     ],
                 ),
-                Group(
-                    CompVar(f"store_uniq{i}"),
-                    [
-                        Connect(
-                            CompPort(uniq_output, "addr0"), ConstantPort(node_width, i)
-                        ),
-                        Connect(
-                            CompPort(uniq_output, "write_data"),
-                            CompPort(uniq[i], "out"),
-                        ),
-                        Connect(CompPort(uniq_output, "write_en"), ConstantPort(1, 1)),
-                        Connect(
-                            HolePort(CompVar(f"store_uniq{i}"), "done"),
-                            CompPort(uniq_output, "done"),
-                        ),
-                    ],
+                write_mem(
+                    f"store_uniq{i}",
+                    uniq_output,
+                    ConstantPort(node_width, i),
+                    CompPort(uniq[i], "out"),
                 ),
             ]
         )
@@ -476,6 +549,9 @@ def node_depth(max_nodes, max_steps, max_paths):
 
     controls = [ParComp(controls)]
 
+    if shared_ptc:
+        controls.insert(0, shared_ptc_control(max_nodes))
+
     for i in range(max_nodes):
         controls.append(ParComp([Enable(f"store_uniq{i}"), Enable(f"store_depth{i}")]))
 
@@ -522,36 +598,398 @@ def node_depth(max_nodes, max_steps, max_paths):
     return program
 
 
-def config_parser(parser):
-    parser.add_argument(
-        "-a",
-        "--auto-size",
-        help="Provide an odgi file that will be used to calculate the hardware dimensions.",
-    )
-    parser.add_argument(
-        "-n",
-        "--max-nodes",
-        type=int,
-        help="Specify the maximum number of nodes that the hardware can support.",
-    )
-    parser.add_argument(
-        "-e",
-        "--max-steps",
-        type=int,
-        help="Specify the maximum number of steps per node that the hardware can support.",
-    )
-    parser.add_argument(
-        "-p",
-        "--max-paths",
-        type=int,
-        help="Specify the maximum number of paths that the hardware can support.",
+def node_depth_pes(max_nodes, max_steps, max_paths, pes, shared_ptc=False):
+    """
+    Generate a node depth accelerator with a fixed number of processing
+    elements. This is the single-node design in
+    processing-elements/calyx_depth_simple.py, replicated pes times: each
+    PE computes the depths of a bank of ceil(max_nodes / pes) nodes, one
+    after another, reading their steps from a single memory per bank (see
+    pollen_data_gen.depth.bank_memories). The PEs keep their results in
+    internal memories, which are copied to depth_output and uniq_output at
+    the end, so the output is the same as node_depth's.
+    """
+    stdlib = Stdlib()
+    banks = pe_banks(max_nodes, pes)
+
+    depth_output = CompVar("depth_output")
+    uniq_output = CompVar("uniq_output")
+    out_idx = CompVar("out_idx")
+    out_idx_adder = CompVar("out_idx_adder")
+
+    ptc_size = max_paths + 1
+    path_id_width = max_paths.bit_length()
+    depth_width = max_steps.bit_length()  # number of bits to represent depth
+    uniq_width = path_id_width  # number of bits to represent uniq depth
+    steps_width = max((max_steps - 1).bit_length(), 1)
+    node_width = max((max_nodes - 1).bit_length(), 1)
+
+    cells = [
+        # External memory cells for the output
+        Cell(
+            depth_output,
+            stdlib.mem_d1(depth_width, max_nodes, node_width),
+            is_external=True,
+        ),
+        Cell(
+            uniq_output,
+            stdlib.mem_d1(uniq_width, max_nodes, node_width),
+            is_external=True,
+        ),
+        # Where the next result goes when copying them to the output
+        Cell(out_idx, stdlib.register(node_width)),
+        Cell(out_idx_adder, stdlib.op("add", node_width, signed=False)),
+    ]
+    wires = [
+        write_reg("init_out_idx", out_idx, ConstantPort(node_width, 0)),
+        update_reg("inc_out_idx", out_idx, out_idx_adder, node_width, 1),
+    ]
+    pe_controls = []
+    copy_controls = []
+
+    ptc_banks = []
+    for k, bank in enumerate(banks, start=1):
+        count = len(bank)  # the number of nodes that this PE handles
+        bank_width = max((count - 1).bit_length(), 1)
+        addr_width = max((count * max_steps - 1).bit_length(), 1)
+
+        path_ids = CompVar(f"path_ids_bank{k}")  # steps of every node
+        paths_to_consider = CompVar(f"paths_to_consider_bank{k}")
+        paths_on_node = CompVar(f"paths_on_node{k}")
+        depth_bank = CompVar(f"depth_bank{k}")  # results for every node
+        uniq_bank = CompVar(f"uniq_bank{k}")
+        ptc_banks.append(paths_to_consider)
+
+        addr = CompVar(f"addr{k}")  # the step being read, across all nodes
+        addr_adder = CompVar(f"addr_adder{k}")
+        node = CompVar(f"node{k}")  # the node being processed
+        node_adder = CompVar(f"node_adder{k}")
+        node_neq = CompVar(f"node_neq{k}")
+
+        path_id_reg = CompVar(f"path_id_reg{k}")
+        idx = CompVar(f"idx{k}")
+        idx_adder = CompVar(f"idx_adder{k}")
+        idx_neq = CompVar(f"idx_neq{k}")
+
+        depth = CompVar(f"depth{k}")
+        depth_temp = CompVar(f"depth_temp{k}")
+        depth_pad = CompVar(f"depth_pad{k}")
+        depth_adder = CompVar(f"depth_adder{k}")
+
+        uniq = CompVar(f"uniq{k}")
+        uniq_and = CompVar(f"uniq_and{k}")
+        uniq_and_reg_l = CompVar(f"uniq_and_reg_l{k}")
+        uniq_and_reg_r = CompVar(f"uniq_and_reg_r{k}")
+        uniq_pad = CompVar(f"uniq_pad{k}")
+        uniq_adder = CompVar(f"uniq_adder{k}")
+
+        uniq_idx = CompVar(f"uniq_idx{k}")
+        uniq_idx_neq = CompVar(f"uniq_idx_neq{k}")
+        uniq_idx_adder = CompVar(f"uniq_idx_adder{k}")
+
+        cells.extend(
+            [
+                Cell(
+                    path_ids,
+                    stdlib.mem_d1(path_id_width, count * max_steps, addr_width),
+                    is_external=True,
+                ),
+                Cell(
+                    paths_to_consider,
+                    stdlib.mem_d1(1, ptc_size, path_id_width),
+                    is_external=not shared_ptc,
+                ),
+                Cell(paths_on_node, stdlib.mem_d1(1, ptc_size, path_id_width)),
+                Cell(depth_bank, stdlib.mem_d1(depth_width, count, bank_width)),
+                Cell(uniq_bank, stdlib.mem_d1(uniq_width, count, bank_width)),
+                # Address and node cells
+                Cell(addr, stdlib.register(addr_width)),
+                Cell(addr_adder, stdlib.op("add", addr_width, signed=False)),
+                Cell(node, stdlib.register(bank_width)),
+                Cell(node_adder, stdlib.op("add", bank_width, signed=False)),
+                Cell(node_neq, stdlib.op("neq", bank_width, signed=False)),
+                # Idx cells
+                Cell(path_id_reg, stdlib.register(path_id_width)),
+                Cell(idx, stdlib.register(steps_width)),
+                Cell(idx_adder, stdlib.op("add", steps_width, signed=False)),
+                Cell(idx_neq, stdlib.op("neq", steps_width, signed=False)),
+                # Cells for node depth computation
+                Cell(depth, stdlib.register(depth_width)),
+                Cell(depth_temp, stdlib.register(1)),
+                Cell(depth_pad, stdlib.pad(1, depth_width)),
+                Cell(depth_adder, stdlib.op("add", depth_width, signed=False)),
+                # Cells for uniq node depth computation
+                Cell(uniq, stdlib.register(uniq_width)),
+                Cell(uniq_and, stdlib.op("and", 1, signed=False)),
+                Cell(uniq_and_reg_l, stdlib.register(1)),
+                Cell(uniq_and_reg_r, stdlib.register(1)),
+                Cell(uniq_pad, stdlib.pad(1, uniq_width)),
+                Cell(uniq_adder, stdlib.op("add", uniq_width, signed=False)),
+                Cell(uniq_idx, stdlib.register(path_id_width)),
+                Cell(uniq_idx_neq, stdlib.op("neq", path_id_width, signed=False)),
+                Cell(uniq_idx_adder, stdlib.op("sub", path_id_width, signed=False)),
+            ]
+        )
+
+        wires.extend(
+            [
+                write_reg(f"init_addr{k}", addr, ConstantPort(addr_width, 0)),
+                update_reg(f"inc_addr{k}", addr, addr_adder, addr_width, 1),
+                write_reg(f"init_node{k}", node, ConstantPort(bank_width, 0)),
+                update_reg(f"inc_node{k}", node, node_adder, bank_width, 1),
+                compare(f"compare_node{k}", node_neq, node, bank_width, count - 1),
+                write_reg(f"init_idx{k}", idx, ConstantPort(steps_width, 0)),
+                update_reg(f"inc_idx{k}", idx, idx_adder, steps_width, 1),
+                compare(f"compare_idx{k}", idx_neq, idx, steps_width, max_steps - 1),
+                load_mem(
+                    f"load_path_id{k}", path_id_reg, path_ids, CompPort(addr, "out")
+                ),
+                # Node depth wires
+                write_reg(f"init_depth{k}", depth, ConstantPort(depth_width, 0)),
+                load_mem(
+                    f"load_consider_path{k}",
+                    depth_temp,
+                    paths_to_consider,
+                    CompPort(path_id_reg, "out"),
+                ),
+                Group(
+                    CompVar(f"inc_depth{k}"),
+                    [
+                        # If path_id is not 0, add 1 to depth
+                        Connect(CompPort(depth_adder, "left"), CompPort(depth, "out")),
+                        Connect(CompPort(depth_pad, "in"), CompPort(depth_temp, "out")),
+                        Connect(
+                            CompPort(depth_adder, "right"), CompPort(depth_pad, "out")
+                        ),
+                        Connect(CompPort(depth, "in"), CompPort(depth_adder, "out")),
+                        Connect(CompPort(depth, "write_en"), ConstantPort(1, 1)),
+                        Connect(
+                            HolePort(CompVar(f"inc_depth{k}"), "done"),
+                            CompPort(depth, "done"),
+                        ),
+                    ],
+                ),
+                write_mem(
+                    f"store_depth{k}",
+                    depth_bank,
+                    CompPort(node, "out"),
+                    CompPort(depth, "out"),
+                ),
+                # Uniq node depth wires
+                write_reg(f"init_uniq{k}", uniq, ConstantPort(uniq_width, 0)),
+                write_reg(
+                    f"init_uniq_idx{k}", uniq_idx, ConstantPort(uniq_width, max_paths)
+                ),
+                compare(
+                    f"compare_uniq_idx{k}", uniq_idx_neq, uniq_idx, path_id_width, 0
+                ),
+                update_reg(
+                    f"dec_uniq_idx{k}", uniq_idx, uniq_idx_adder, path_id_width, 1
+                ),
+                write_mem(
+                    f"update_pon{k}",
+                    paths_on_node,
+                    CompPort(path_id_reg, "out"),
+                    ConstantPort(1, 1),
+                ),
+                load_mem(
+                    f"load_and_l{k}",
+                    uniq_and_reg_l,
+                    paths_on_node,
+                    CompPort(uniq_idx, "out"),
+                ),
+                load_mem(
+                    f"load_and_r{k}",
+                    uniq_and_reg_r,
+                    paths_to_consider,
+                    CompPort(uniq_idx, "out"),
+                ),
+                # Clear paths_on_node as we go, ready for the next node
+                write_mem(
+                    f"clear_pon{k}",
+                    paths_on_node,
+                    CompPort(uniq_idx, "out"),
+                    ConstantPort(1, 0),
+                ),
+                Group(
+                    CompVar(f"inc_uniq{k}"),
+                    [
+                        Connect(
+                            CompPort(uniq_and, "left"), CompPort(uniq_and_reg_l, "out")
+                        ),
+                        Connect(
+                            CompPort(uniq_and, "right"), CompPort(uniq_and_reg_r, "out")
+                        ),
+                        Connect(CompPort(uniq_adder, "left"), CompPort(uniq, "out")),
+                        Connect(CompPort(uniq_pad, "in"), CompPort(uniq_and, "out")),
+                        Connect(
+                            CompPort(uniq_adder, "right"), CompPort(uniq_pad, "out")
+                        ),
+                        Connect(CompPort(uniq, "in"), CompPort(uniq_adder, "out")),
+                        Connect(CompPort(uniq, "write_en"), ConstantPort(1, 1)),
+                        Connect(
+                            HolePort(CompVar(f"inc_uniq{k}"), "done"),
+                            CompPort(uniq, "done"),
+                        ),
+                    ],
+                ),
+                write_mem(
+                    f"store_uniq{k}",
+                    uniq_bank,
+                    CompPort(node, "out"),
+                    CompPort(uniq, "out"),
+                ),
+                # Copying the results to the output
+                Group(
+                    CompVar(f"copy_depth{k}"),
+                    [
+                        Connect(CompPort(depth_bank, "addr0"), CompPort(node, "out")),
+                        Connect(
+                            CompPort(depth_output, "addr0"), CompPort(out_idx, "out")
+                        ),
+                        Connect(
+                            CompPort(depth_output, "write_data"),
+                            CompPort(depth_bank, "read_data"),
+                        ),
+                        Connect(CompPort(depth_output, "write_en"), ConstantPort(1, 1)),
+                        Connect(
+                            HolePort(CompVar(f"copy_depth{k}"), "done"),
+                            CompPort(depth_output, "done"),
+                        ),
+                    ],
+                ),
+                Group(
+                    CompVar(f"copy_uniq{k}"),
+                    [
+                        Connect(CompPort(uniq_bank, "addr0"), CompPort(node, "out")),
+                        Connect(
+                            CompPort(uniq_output, "addr0"), CompPort(out_idx, "out")
+                        ),
+                        Connect(
+                            CompPort(uniq_output, "write_data"),
+                            CompPort(uniq_bank, "read_data"),
+                        ),
+                        Connect(CompPort(uniq_output, "write_en"), ConstantPort(1, 1)),
+                        Connect(
+                            HolePort(CompVar(f"copy_uniq{k}"), "done"),
+                            CompPort(uniq_output, "done"),
+                        ),
+                    ],
+                ),
+            ]
+        )
+
+        # Compute one node's depth, as in calyx_depth_simple.py, except that
+        # the steps are read from the next max_steps entries of the bank
+        compute_depth = SeqComp(
+            [Enable(f"load_consider_path{k}"), Enable(f"inc_depth{k}")]
+        )
+        node_body = SeqComp(
+            [
+                ParComp(
+                    [
+                        Enable(f"init_idx{k}"),
+                        Enable(f"init_uniq_idx{k}"),
+                        Enable(f"init_depth{k}"),
+                        Enable(f"init_uniq{k}"),
+                    ]
+                ),
+                While(
+                    CompPort(idx_neq, "out"),
+                    CompVar(f"compare_idx{k}"),
+                    SeqComp(
+                        [
+                            Enable(f"load_path_id{k}"),
+                            ParComp(
+                                [
+                                    Enable(f"inc_idx{k}"),
+                                    Enable(f"inc_addr{k}"),
+                                    compute_depth,
+                                    Enable(f"update_pon{k}"),
+                                ]
+                            ),
+                        ]
+                    ),
+                ),
+                Enable(f"load_path_id{k}"),
+                ParComp(
+                    [Enable(f"inc_addr{k}"), compute_depth, Enable(f"update_pon{k}")]
+                ),
+                While(
+                    CompPort(uniq_idx_neq, "out"),
+                    CompVar(f"compare_uniq_idx{k}"),
+                    SeqComp(
+                        [
+                            ParComp(
+                                [Enable(f"load_and_l{k}"), Enable(f"load_and_r{k}")]
+                            ),
+                            ParComp([Enable(f"inc_uniq{k}"), Enable(f"clear_pon{k}")]),
+                            Enable(f"dec_uniq_idx{k}"),
+                        ]
+                    ),
+                ),
+                ParComp([Enable(f"store_depth{k}"), Enable(f"store_uniq{k}")]),
+            ]
+        )
+        pe_controls.append(
+            SeqComp(
+                [
+                    ParComp([Enable(f"init_addr{k}"), Enable(f"init_node{k}")]),
+                    While(
+                        CompPort(node_neq, "out"),
+                        CompVar(f"compare_node{k}"),
+                        SeqComp([node_body, Enable(f"inc_node{k}")]),
+                    ),
+                    node_body,
+                ]
+            )
+        )
+
+        copy_result = ParComp([Enable(f"copy_depth{k}"), Enable(f"copy_uniq{k}")])
+        copy_controls.extend(
+            [
+                Enable(f"init_node{k}"),
+                While(
+                    CompPort(node_neq, "out"),
+                    CompVar(f"compare_node{k}"),
+                    SeqComp(
+                        [
+                            copy_result,
+                            ParComp([Enable(f"inc_node{k}"), Enable("inc_out_idx")]),
+                        ]
+                    ),
+                ),
+                copy_result,
+                Enable("inc_out_idx"),
+            ]
+        )
+
+    controls = [ParComp(pe_controls), SeqComp([Enable("init_out_idx")] + copy_controls)]
+
+    if shared_ptc:
+        cells.extend(shared_ptc_cells(stdlib, ptc_size, path_id_width))
+        wires.extend(shared_ptc_wires(ptc_banks, path_id_width, max_paths))
+        controls.insert(0, shared_ptc_control(len(ptc_banks)))
+
+    main_component = Component(
+        name="main",
+        inputs=[],
+        outputs=[],
+        structs=cells + wires,
+        controls=SeqComp(controls),
     )
-    parser.add_argument(
-        "-o",
-        "--out",
-        help="Specify the output file. If not specified, will dump to stdout.",
+
+    # Create the Calyx program.
+    program = Program(
+        imports=[
+            Import("primitives/core.futil"),
+            Import("primitives/binary_operators.futil"),
+        ],
+        components=[main_component],
     )
 
+    return program
+
 
 # def get_maxes(filename):
 #     print("In `get_maxes`. Filename: ", filename)
@@ -580,7 +1018,7 @@ def config_parser(parser):
 
 def run(args):
     max_nodes, max_steps, max_paths = parse_data.get_dimensions(args)
-    program = node_depth(max_nodes, max_steps, max_paths)
+    program = node_depth(max_nodes, max_steps, max_paths, args.shared_ptc, args.pes)
     output = program.doc()
 
     # Ouput the program
@@ -594,7 +1032,7 @@ def run(args):
 if __name__ == "__main__":
     # Parse commandline input
     parser = argparse.ArgumentParser()
-    config_parser(parser)
+    accel_args.config_parser(parser)
     args = parser.parse_args()
 
     run(args)
@@ -4,25 +4,31 @@ Combines the commandline interface for calyx_depth.py and parse_data.py. Run ./m
 
 import argparse
 import json
+import os
 import os.path
-import subprocess
+import shutil
 import tempfile
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
-import pollen.depth.calyx_depth as depth
+import pollen.depth.cache as cache
+import pollen.depth.accel_args as accel_args
 import pollen.depth.parse_data as parse_data
+import pollen.depth.simulate as simulate
+import pollen.depth.timing as timing
+from pollen_data_gen import image, tile
 from pollen.argparse_custom import store_const_and_arg
 
 
 def config_parser(parser):
-    depth.config_parser(parser)
+    accel_args.config_parser(parser)
 
     parser.add_argument(
         "-a",
         "--auto-size",
         nargs="?",
         const="d",
-        help="Provide an odgi file that will be used to calculate the hardware dimensions. If the flag is set with no argument, the argument of --parse-data or --run is used instead. Specified hardware dimensions take precedence.",
+        help="Provide a graph (.og, .gfa, or .flatgfa) that will be used to calculate the hardware dimensions. If the flag is set with no argument, the argument of --parse-data or --run is used instead. Specified hardware dimensions take precedence.",
     )
 
     parser.set_defaults(action="gen")
@@ -42,7 +48,7 @@ def config_parser(parser):
         action=store_const_and_arg,
         const="run",
         default="gen",
-        help="Run node depth on the given .og or .data file. Outputs the node depth table. Should not be used with --gen or --parse-data.",
+        help="Run node depth on the given graph (.og, .gfa, or .flatgfa), .data file, or .bin memory image. Outputs the node depth table. Should not be used with --gen or --parse-data.",
     )
     parser.add_argument(
         "-d",
@@ -52,7 +58,7 @@ def config_parser(parser):
         action=store_const_and_arg,
         const="parse",
         default="gen",
-        help="Parse the .og file to accelerator input. Should not be used with --gen or --run.",
+        help="Parse the graph (.og, .gfa, or .flatgfa) to accelerator input. Should not be used with --gen or --run.",
     )
 
     parser.add_argument(
@@ -67,22 +73,153 @@ def config_parser(parser):
         "--accelerator",
         help="Specify a node depth accelerator to run. Should only be set if the --run flag is set.",
     )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="Should only be used if the --parse-data flag is set. Writes a binary memory image (and a .json manifest next to it) instead of a .data file.",
+    )
+    parser.add_argument(
+        "--tile",
+        action="store_true",
+        help="Should only be used if the --run or --parse-data flag is set. Splits the graph into tiles that fit the accelerator's dimensions, so that graphs too big for it can still be processed. With --run, the tiles run concurrently and their results are combined.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="With --run and --tile, the number of tiles to simulate at once. Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--sim",
+        choices=["fud", "numpy"],
+        default="fud",
+        help="With --run, how to simulate the accelerator: with fud and the Calyx interpreter (the default), or with a much faster NumPy model of it. The NumPy simulator needs no accelerator, so none is generated.",
+    )
     parser.add_argument(
         "--pr",
         action="store_true",
         help="Print profiling info. Passes the -pr flag to fud if --run is set.",
     )
 
+    parser.add_argument(
+        "--timing",
+        choices=timing.FORMATS,
+        help="With --run, report each stage's wall time, peak memory, and output size: as JSON lines, as each stage finishes, or as a table at the end. fud compiles and simulates the accelerator in a single simulate stage; --pr breaks that stage down further. The report goes to stderr unless --timing-out is set.",
+    )
+    parser.add_argument(
+        "--timing-out",
+        help="Write the --timing report to this file instead of stderr.",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="With --run, profile each stage that runs in Python with cProfile, and write the profiles to DIR/<stage>.pstats. With --tile and --sim numpy, the tiles are then simulated one at a time.",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="With --run, always generate a fresh accelerator instead of using one from the accelerator cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="The accelerator cache's directory. Defaults to $POLLEN_CACHE_DIR, or pollen/depth in the user's cache directory.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=cache.MAX_BYTES // 2**20,
+        help="The accelerator cache's size limit in MiB. The least recently used accelerators are evicted beyond it.",
+    )
+
     parser.add_argument(
         "--tmp-dir",
         help="Specify a directory to store temporary files in. The files will not be deleted at the end of execution.",
     )
 
 
-def run_accel(args, tmp_dir_name):
+def fud_command(futil_file, data_file):
+    """
+    The command that simulates the accelerator on the data file
+    """
+    return [
+        "fud",
+        "e",
+        futil_file,
+        "--to",
+        "interpreter-out",
+        "-s",
+        "verilog.data",
+        data_file,
+    ]
+
+
+def run_tiles(args, tmp_dir_name, base, futil_file, stages):
+    """
+    Split the graph into tiles, simulate the accelerator on each of them
+    concurrently, and combine the results into a node depth table
+    """
+
+    if args.pr:
+        warnings.warn("--pr is ignored with --tile.", SyntaxWarning)
+    numpy_sim = args.sim == "numpy"
+
+    with stages.stage("parse"):
+        max_nodes, max_steps, max_paths = parse_data.get_dimensions(args)
+        tiling = parse_data.parse_tiles(
+            args.filename, args.subset_paths, max_nodes, max_steps, max_paths
+        )
+    with stages.stage("data") as outputs:
+        data_files = tile.write_tiles(
+            tiling,
+            f"{tmp_dir_name}/{base}",
+            max_nodes,
+            max_steps,
+            max_paths,
+            args.shared_ptc,
+            binary=numpy_sim,  # The NumPy simulator reads images directly
+            pes=args.pes,
+        )
+        outputs.extend(data_files)
+
+    def run_tile(data_file):
+        if numpy_sim:
+            return simulate.simulate_file(data_file), None
+        calyx_out = stages.run(fud_command(futil_file, data_file))
+        try:
+            return json.loads(calyx_out.stdout), None
+        except ValueError:
+            return None, calyx_out.stderr
+
+    # cProfile sees only the thread that enables it, so run the NumPy
+    # simulator on this thread, one tile at a time, when profiling.
+    serial = numpy_sim and stages.profile_dir
+    outputs = []
+    with stages.stage("simulate", external=not numpy_sim), ThreadPoolExecutor(
+        1 if serial else args.jobs
+    ) as pool:
+        tile_map = map if serial else pool.map
+        for data_file, (calyx_out, error) in zip(
+            data_files, tile_map(run_tile, data_files)
+        ):
+            if calyx_out is None:
+                return f"{os.path.basename(data_file)}: {error}"
+            outputs.append(parse_data.calyx_outputs(calyx_out, True))
+
+    header = "#node.id\tdepth\tdepth.uniq"
+    rows = [
+        f"{node}\t{depth}\t{uniq}" for node, depth, uniq in tile.reduce(tiling, outputs)
+    ]
+    return "\n".join([header] + rows)
+
+
+def run_accel(args, tmp_dir_name, stages=None):
     """
-    Run the node depth accelerator
+    Run the node depth accelerator, recording each stage in stages
     """
+    stages = stages or timing.Stages()
 
     # Data parser
     parser = argparse.ArgumentParser()
@@ -92,22 +229,41 @@ def run_accel(args, tmp_dir_name):
     out_file = args.out
     basename = os.path.basename(args.filename)
     base, ext = os.path.splitext(basename)
-
-    if ext == ".data":  # Data file was provided
+    numpy_sim = args.sim == "numpy"
+    if numpy_sim and args.pr:
+        warnings.warn("--pr is ignored with --sim numpy.", SyntaxWarning)
+
+    if args.tile:  # The tiles are written by run_tiles
+        if ext in (".data", ".bin"):
+            raise ValueError("Tiling needs a graph, not a data file.")
+        data_file = None
+    elif ext == ".data":  # Data file was provided
         if args.auto_size == "d":
             warnings.warn("Cannot infer dimensions from .data file.", SyntaxWarning)
         data_file = args.filename
+    elif ext == ".bin":  # Binary memory image was provided
+        if args.auto_size == "d":
+            warnings.warn("Cannot infer dimensions from a memory image.", SyntaxWarning)
+        if numpy_sim:
+            data_file = args.filename
+        else:  # fud only reads JSON, so convert the image back.
+            data_file = f"{tmp_dir_name}/{base}.data"
+            with stages.stage("convert") as outputs, open(data_file, "w") as data:
+                image.image_to_json(args.filename, data)
+                outputs.append(data_file)
     else:
-        # parse_data_file(args, tmp_dir_name)
-        data_file = f"{tmp_dir_name}/{base}.data"
+        data_file = f"{tmp_dir_name}/{base}.{'bin' if numpy_sim else 'data'}"
         new_args = [args.filename, "--out", data_file]
         parser.parse_args(new_args, namespace=args)
-        # print("here1")
-        parse_data.run(args)
-        # print("here2")
+        args.binary = numpy_sim  # fud only reads JSON.
+        with stages.stage("parse") as outputs:
+            parse_data.run(args)
+            outputs.append(data_file)
 
     # Generate the accelerator if necessary
-    if args.accelerator:
+    if numpy_sim:
+        futil_file = None
+    elif args.accelerator:
         futil_file = args.accelerator
     else:
         futil_file = f"{tmp_dir_name}/{base}.futil"
@@ -115,25 +271,45 @@ def run_accel(args, tmp_dir_name):
         if args.auto_size == "d":
             new_args.extend(["-a", args.filename])
         parser.parse_args(new_args, namespace=args)
-        depth.run(args)
+        with stages.stage("generate") as outputs:
+            if args.no_cache:
+                # Calyx is only needed to generate accelerators.
+                import pollen.depth.calyx_depth as depth
+
+                depth.run(args)
+            else:  # Reuse an accelerator with the same dimensions if we can
+                max_nodes, max_steps, max_paths = parse_data.get_dimensions(args)
+                futil_file = cache.accelerator(
+                    max_nodes,
+                    max_steps,
+                    max_paths,
+                    cache_dir=args.cache_dir,
+                    max_bytes=args.cache_size * 2**20,
+                    shared_ptc=args.shared_ptc,
+                    pes=args.pes,
+                )
+                if args.tmp_dir:  # Keep a copy with the other files
+                    futil_file = shutil.copyfile(
+                        futil_file, f"{tmp_dir_name}/{base}.futil"
+                    )
+            outputs.append(futil_file)
 
     # Compute the node depth
-    cmd = [
-        "fud",
-        "e",
-        futil_file,
-        "--to",
-        "interpreter-out",
-        "-s",
-        "verilog.data",
-        data_file,
-    ]
-    if args.pr:
-        cmd.append("-pr")
-        calyx_out = subprocess.run(cmd, capture_output=True, text=True)
+    if args.tile:
+        output = run_tiles(args, tmp_dir_name, base, futil_file, stages)
+    elif numpy_sim:
+        with stages.stage("simulate"):
+            calyx_out = simulate.simulate_file(data_file)
+        output = parse_data.from_calyx(calyx_out, True)
+    elif args.pr:
+        cmd = fud_command(futil_file, data_file) + ["-pr"]
+        with stages.stage("simulate", external=True):
+            calyx_out = stages.run(cmd)
         output = calyx_out.stdout
     else:
-        calyx_out = subprocess.run(cmd, capture_output=True, text=True)
+        cmd = fud_command(futil_file, data_file)
+        with stages.stage("simulate", external=True):
+            calyx_out = stages.run(cmd)
         try:
             # Convert calyx output to a node depth table
             calyx_out = json.loads(calyx_out.stdout)
@@ -142,36 +318,13 @@ def run_accel(args, tmp_dir_name):
             output = calyx_out.stderr
 
     # Output the ndt
-    if out_file:
-        with open(out_file, "w") as out_file:
-            out_file.write(output)
-    else:
-        print(output)
-
-
-def parse_data_file(args, tmp_dir_name):
-    # Parser for parsing input to data file parser
-    parser = argparse.ArgumentParser()
-    parse_data.config_parser(parser)
-
-    filename = args.filename
-    basename = os.path.basename(filename)
-    base, ext = os.path.splitext(basename)
-
-    if ext == ".gfa":  # Build an odgi file
-        data_file = f"{tmp_dir_name}/{base}.data"
-        og_file = f"{tmp_dir_name}/{base}.og"
-        cmd = ["odgi", "build", "--gfa", filename, "--out", og_file]
-        subprocess.run(cmd)
-
-        new_args = [og_file, "--out", data_file]
-    elif ext == ".og":  # Construct the pollen data file
-        data_file = f"{tmp_dir_name}/{base}.data"
-        new_args = [filename, "--out", data_file]
-    else:
-        raise Exception(f"file extension {ext} not recognized")
-    parser.parse_args(new_args, namespace=args)
-    parse_data.run(new_args)
+    with stages.stage("output") as outputs:
+        if out_file:
+            outputs.append(out_file)
+            with open(out_file, "w") as out_file:
+                out_file.write(output)
+        else:
+            print(output)
 
 
 def run(args):
@@ -181,6 +334,8 @@ def run(args):
                 "--subset-paths, --accelerator, and --pr will be ignored if action is gen.",
                 SyntaxWarning,
             )
+        import pollen.depth.calyx_depth as depth
+
         depth.run(args)
 
     elif args.action == "parse":  # Generate a data file
@@ -198,12 +353,14 @@ def run(args):
         parse_data.run(args)
 
     elif args.action == "run":  # Run the accelerator
+        stages = timing.Stages(args.timing, args.timing_out, args.profile)
         if args.tmp_dir:
-            with open(args.tmp_dir, "w") as tmp_dir_name:
-                run_accel(args, tmp_dir_name)
+            os.makedirs(args.tmp_dir, exist_ok=True)
+            run_accel(args, args.tmp_dir, stages)
         else:
             with tempfile.TemporaryDirectory() as tmp_dir_name:
-                run_accel(args, tmp_dir_name)
+                run_accel(args, tmp_dir_name, stages)
+        stages.finish()
 
 
 def main():
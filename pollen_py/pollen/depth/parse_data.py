@@ -1,11 +1,18 @@
 """
-This file converts an odgi graph to numerical JSON data
+This file converts an odgi, GFA, or FlatGFA graph to numerical JSON data
 that can be used by calyx hardware simulators.
 """
 
 import argparse
+import functools
 import json
-import odgi
+import os.path
+
+import numpy as np
+
+from pollen_data_gen import image, tile
+import pollen_data_gen.depth as depth_gen
+from pollen.argparse_custom import positive_int
 
 # Defaults for the maximum possible number of nodes, steps per node,
 # and paths to consider
@@ -21,63 +28,192 @@ class GraphTooBigError(Exception):
     """
 
 
-def parse_odgi(filename, subset_paths, max_nodes, max_steps, max_paths):
+def load_og(filename):
     """
-    Create a calyx node depth input file using the graph in './{filename}'
-    and the paths listed in './{subset_paths}'
+    Read the path names and each node's path ids from an odgi graph, using
+    odgi's Python bindings
     """
 
+    # odgi is only needed for .og files, so we only import it for them.
+    import odgi
+
     graph = odgi.graph()
     graph.load(filename)
 
+    # Assign a path_id to each path; the path_ids are not accessible using the
+    # default python bindings for odgi
+
+    # Obtain a list of path names; a path's index is its id
+    paths = []
+    graph.for_each_path_handle(lambda h: paths.append(graph.get_path_name(h)))
+
+    # Path name -> path id
+    path_name_to_id = {path: count for count, path in enumerate(paths, start=1)}
+
+    nodes = []
+
+    def parse_node(node_h):
+        path_ids = []
+
+        def parse_step(step_h):
+            path_ids.append(
+                path_name_to_id[graph.get_path_name(graph.get_path(step_h))]
+            )
+
+        graph.for_each_step_on_handle(node_h, parse_step)
+        nodes.append((graph.get_id(node_h), path_ids))
+
+    graph.for_each_handle(parse_node)
+    return paths, nodes
+
+
+def load_flatgfa(filename):
+    """
+    Read the path names and each node's path ids from a .gfa or .flatgfa
+    file, using flatgfa. Rather than visiting each node's steps, this
+    collects every path's steps and groups them by node in bulk.
+    """
+
+    # flatgfa is optional, so we only import it when asked.
+    import flatgfa
+
+    if os.path.splitext(filename)[1] == ".flatgfa":
+        gfa = flatgfa.load(filename)
+    else:
+        gfa = flatgfa.parse(filename)
+
+    paths = []
+    steps = []  # The segment of each step, path by path
+    for path in gfa.paths:
+        name = path.name
+        paths.append(name.decode() if isinstance(name, bytes) else name)
+        steps.append(
+            np.fromiter((h.seg_id for h in path), dtype=np.int64, count=len(path))
+        )
+
+    # Sort the steps by segment, keeping each segment's steps in path order
+    step_segs = np.concatenate(steps) if steps else np.zeros(0, dtype=np.int64)
+    step_paths = np.repeat(np.arange(1, len(paths) + 1), [len(s) for s in steps])
+    path_ids = step_paths[np.argsort(step_segs, kind="stable")].tolist()
+    ends = np.cumsum(np.bincount(step_segs, minlength=len(gfa.segments))).tolist()
+
+    nodes = [
+        (seg.name, path_ids[start:end])
+        for seg, start, end in zip(gfa.segments, [0] + ends, ends)
+    ]
+    return paths, nodes
+
+
+@functools.lru_cache(maxsize=1)
+def cached_graph(filename, mtime):
+    """
+    Load a graph; see load_graph. Keyed by the file's modification time, so
+    that a graph that changes is loaded again.
+    """
+
+    if os.path.splitext(filename)[1] == ".og":
+        paths, nodes = load_og(filename)
+    else:
+        paths, nodes = load_flatgfa(filename)
+    nodes.sort()
+    return paths, nodes
+
+
+def load_graph(filename):
+    """
+    Load the graph in './{filename}', an odgi (.og), GFA (.gfa), or FlatGFA
+    (.flatgfa) file. Return its path names, where a path's id is its index
+    plus one, and a list of (node id, path ids) pairs, sorted by node id,
+    giving the path id of each step on each node. The most recently loaded
+    graph is kept, so that computing the dimensions and then the data only
+    loads it once.
+    """
+
+    return cached_graph(filename, os.stat(filename).st_mtime_ns)
+
+
+def parse_odgi(
+    filename, subset_paths, max_nodes, max_steps, max_paths, shared_ptc=False
+):
+    """
+    Create a calyx node depth input file using the graph in './{filename}'
+    and the paths listed in './{subset_paths}'. If shared_ptc is set, emit
+    paths_to_consider once instead of once per node. Despite the name, the
+    graph may be in any format that load_graph reads.
+    """
+
+    paths, nodes = load_graph(filename)
+
     # Check that the number of paths on the graph does not exceed max_paths
-    if graph.get_path_count() > max_paths:
+    if len(paths) > max_paths:
         raise GraphTooBigError(
             "The number of paths in the graph exceeds the maximum number of "
             "paths the hardware can process. "
-            f"{graph.get_path_count()} > {args.max_paths}. "
+            f"{len(paths)} > {max_paths}. "
             "Hint: try setting the maximum number of paths manually "
             "using the -p flag"
         )
 
-    # Assign a path_id to each path; the path_ids are not accessible using the
-    # default python bindings for odgi
-
-    # Obtain a list of path names; a path's index is its id
-    paths = []
-    graph.for_each_path_handle(lambda h: paths.append(graph.get_path_name(h)))
-
     # Path name -> path id
     path_name_to_id = {path: count for count, path in enumerate(paths, start=1)}
 
     paths_to_consider = parse_paths_file(subset_paths, path_name_to_id, max_paths)
 
-    data = parse_steps_on_nodes(graph, path_name_to_id, max_nodes, max_steps, max_paths)
+    data = parse_steps_on_nodes(nodes, max_nodes, max_steps, max_paths)
 
-    for i in range(1, max_nodes + 1):
-        data[f"paths_to_consider{i}"] = {
-            "data": paths_to_consider,
-            "format": {"numeric_type": "bitnum", "is_signed": False, "width": 1},
-        }
+    ptc_format = {"numeric_type": "bitnum", "is_signed": False, "width": 1}
+    if shared_ptc:
+        data["paths_to_consider"] = {"data": paths_to_consider, "format": ptc_format}
+    else:
+        for i in range(1, max_nodes + 1):
+            data[f"paths_to_consider{i}"] = {
+                "data": paths_to_consider,
+                "format": ptc_format,
+            }
 
     return data
 
 
-def parse_steps_on_nodes(graph, path_name_to_id, max_nodes, max_steps, max_paths):
+def parse_tiles(filename, subset_paths, max_nodes, max_steps, max_paths):
+    """
+    Split the graph in './{filename}' into tiles that fit an accelerator
+    with the given dimensions, counting only the paths listed in
+    './{subset_paths}'. See pollen_data_gen.tile.
+    """
+
+    paths, nodes = load_graph(filename)
+    path_name_to_id = {path: count for count, path in enumerate(paths, start=1)}
+
+    # Tiles number their paths locally, so the graph may have more paths
+    # than max_paths; only the paths we consider matter.
+    paths_to_consider = parse_paths_file(subset_paths, path_name_to_id, len(paths))
+
+    return tile.plan(
+        (
+            (str(node_id), [p for p in path_ids if paths_to_consider[p]])
+            for node_id, path_ids in nodes
+        ),
+        max_nodes,
+        max_steps,
+        max_paths,
+    )
+
+
+def parse_steps_on_nodes(nodes, max_nodes, max_steps, max_paths):
     """
     Generate input data containing the path ids for each step on each
     node in the graph, e.g.
     {path_ids1:
         "data": [0, 1, 1, 2],
             "format": {
-                "numeric_type": "bitnum",8kklkskl
+                "numeric_type": "bitnum",
                 "is_signed": False,
                 "width": 2
             }
     }
     """
 
-    num_nodes = graph.get_node_count()
+    num_nodes = len(nodes)
 
     # Check that the number of steps on the node does not exceed max_steps
     if num_nodes > max_nodes:
@@ -92,42 +228,26 @@ def parse_steps_on_nodes(graph, path_name_to_id, max_nodes, max_steps, max_paths
     width = max_paths.bit_length()
 
     # Initialize the data for each node
-    def parse_node(node_h):
-        """
-        Get a list of path ids for each step on node_h.
-        """
-
+    for node_id, path_ids in nodes:
         # Check that the number of steps on the node does not exceed max_steps
-        if graph.get_step_count(node_h) > max_steps:
+        if len(path_ids) > max_steps:
             raise GraphTooBigError(
                 "The number of paths in the graph exceeds the maximum number of "
                 "paths the hardware can process. "
-                f"{graph.get_step_count(node_h)} > {max_steps}. "
+                f"{len(path_ids)} > {max_steps}. "
                 "Hint: try setting the maximum number of steps manually "
                 "using the -e flag."
             )
 
-        path_ids = []
-
-        def parse_step(step_h):
-            path_h = graph.get_path(step_h)
-            path_id = path_name_to_id[graph.get_path_name(path_h)]
-            path_ids.append(path_id)
-
-        graph.for_each_step_on_handle(node_h, parse_step)
-
         # Pad path_ids with 0s
         path_ids = path_ids + [0] * (max_steps - len(path_ids))
 
         # 'path_ids{id}' is the list of path ids for each step crossing node {id}
-        node_id = graph.get_id(node_h)
         data[f"path_ids{node_id}"] = {
             "data": path_ids,
             "format": {"numeric_type": "bitnum", "is_signed": False, "width": width},
         }
 
-    graph.for_each_handle(parse_node)
-
     default_steps = [0] * max_steps
 
     while num_nodes < max_nodes:
@@ -185,20 +305,11 @@ def parse_paths_file(filename, path_name_to_id, max_paths):
 
 def get_maxes(filename):
     """Get the maximum number of nodes, steps, and paths in the graph."""
-    graph = odgi.graph()
-    graph.load(filename)
-
-    max_nodes = graph.get_node_count()
-    max_steps = 0
-    max_paths = graph.get_path_count()
+    paths, nodes = load_graph(filename)
 
-    def update_max_steps(node_h):
-        nonlocal max_steps
-        num_steps = graph.get_step_count(node_h)
-        if num_steps > max_steps:
-            max_steps = num_steps
-
-    graph.for_each_handle(update_max_steps)
+    max_nodes = len(nodes)
+    max_steps = max((len(path_ids) for _, path_ids in nodes), default=0)
+    max_paths = len(paths)
 
     return max_nodes, max_steps, max_paths
 
@@ -228,17 +339,30 @@ def get_dimensions(args):
     return max_nodes, max_steps, max_paths
 
 
+def to_memories(data):
+    """
+    List the memories in a data dict as (name, data, format) triples, sorted
+    by name, for writing as a binary memory image
+    """
+    return [(name, mem["data"], mem["format"]) for name, mem in sorted(data.items())]
+
+
+def calyx_outputs(calyx_out, from_interp):
+    """
+    Get the depth and uniq output memories from a calyx output file
+    """
+
+    if from_interp:
+        return calyx_out["main"]["depth_output"], calyx_out["main"]["uniq_output"]
+    return calyx_out["memories"]["depth_output"], calyx_out["memories"]["uniq_output"]
+
+
 def from_calyx(calyx_out, from_interp, max_nodes=None):
     """
     Parse a calyx output file to the odgi format
     """
 
-    if from_interp:
-        depths = calyx_out["main"]["depth_output"]
-        uniqs = calyx_out["main"]["uniq_output"]
-    else:
-        depths = calyx_out["memories"]["depth_output"]
-        uniqs = calyx_out["memories"]["uniq_output"]
+    depths, uniqs = calyx_outputs(calyx_out, from_interp)
 
     if not max_nodes:
         max_nodes = len(depths)
@@ -253,7 +377,7 @@ def config_parser(parser):
     parser.add_argument(
         "filename",
         help="The file to be parsed. If the -d and -i flags are not specified, "
-        "this must be an odgi file.",
+        "this must be a graph: an odgi (.og), GFA, or FlatGFA file.",
     )
     parser.add_argument(
         "-s",
@@ -280,7 +404,7 @@ def config_parser(parser):
         "--auto-size",
         nargs="?",
         const="d",
-        help="Provide an odgi file that will be used to calculate the hardware "
+        help="Provide a graph file that will be used to calculate the hardware "
         "dimensions. If the flag is specified with no argument, use the file "
         "to be parsed. Specified hardware dimensions take precedence.",
     )
@@ -308,6 +432,33 @@ def config_parser(parser):
         "--out",
         help="Specify the output file. If not specified, will dump to stdout.",
     )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="Write a binary memory image to the output file (and its manifest "
+        "to the output file with .json appended) instead of JSON. Requires -o.",
+    )
+    parser.add_argument(
+        "--shared-ptc",
+        action="store_true",
+        help="Emit a single paths_to_consider memory shared by all nodes, for "
+        "accelerators generated with --shared-ptc.",
+    )
+    parser.add_argument(
+        "--pes",
+        type=positive_int,
+        help="Bank the memories for an accelerator generated with this many "
+        "processing elements.",
+    )
+    parser.add_argument(
+        "--tile",
+        action="store_true",
+        help="Split the graph into inputs for an accelerator of the given "
+        "dimensions, even if it is too small for the whole graph. Writes one "
+        "file per tile, named after the output file, and a .tiles.json plan. "
+        "Requires -o.",
+    )
 
 
 def run(args):
@@ -318,9 +469,44 @@ def run(args):
     else:
         max_nodes, max_steps, max_paths = get_dimensions(args)
 
+        if args.tile:
+            if not args.out:
+                raise ValueError("Tiling needs an output file (-o).")
+            tiling = parse_tiles(
+                args.filename, args.subset_paths, max_nodes, max_steps, max_paths
+            )
+            tile.write_tiles(
+                tiling,
+                os.path.splitext(args.out)[0],
+                max_nodes,
+                max_steps,
+                max_paths,
+                args.shared_ptc,
+                args.binary,
+                args.pes,
+            )
+            return
+
         data = parse_odgi(
-            args.filename, args.subset_paths, max_nodes, max_steps, max_paths
+            args.filename,
+            args.subset_paths,
+            max_nodes,
+            max_steps,
+            max_paths,
+            args.shared_ptc,
         )
+        if args.pes is not None:
+            data = {
+                name: {"data": mem_data, "format": mem_format}
+                for name, mem_data, mem_format in depth_gen.bank_memories(
+                    to_memories(data), max_nodes, args.pes
+                )
+            }
+        if args.binary:
+            if not args.out:
+                raise ValueError("A binary memory image needs an output file (-o).")
+            image.write_image(to_memories(data), args.out)
+            return
         output = json.dumps(data, indent=2, sort_keys=True)
 
     if args.out:
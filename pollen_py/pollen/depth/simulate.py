@@ -0,0 +1,196 @@
+"""
+A NumPy simulator for the node depth accelerator.
+
+Simulating the generated Calyx program with fud is slow even for small
+graphs. This computes the same output memories directly from an input
+.data file or binary memory image, with the accelerator's semantics:
+
+- Every one of a node's max_steps path_ids entries is read, padding
+  included, and counts towards the node's depth if paths_to_consider has
+  a 1 at that path id. The data generators always set
+  paths_to_consider[0] to 0, so padding does not count.
+- Uniq depth counts the path ids from max_paths down to 1 (never 0) that
+  occur on the node and are in paths_to_consider.
+- depth_output is max_steps.bit_length() bits wide, and uniq_output is
+  max_paths.bit_length() bits wide; results wrap around.
+
+It handles all of the generator's layouts: one paths_to_consider per node,
+a single shared one (--shared-ptc), and the banked memories of a
+processing-element accelerator (--pes).
+"""
+
+import argparse
+import json
+import re
+
+import numpy as np
+
+from pollen_data_gen import image
+
+
+def load(filename):
+    """
+    Read an accelerator input, a .data file or a binary memory image, into
+    a dictionary from memory names to (array, format) pairs
+    """
+    if filename.endswith((".bin", image.MANIFEST_EXT)):
+        return load_image(filename)
+    with open(filename, "r", encoding="utf-8") as data_file:
+        data = json.load(data_file)
+    return {
+        name: (np.array(mem["data"], dtype=np.int64), mem["format"])
+        for name, mem in data.items()
+    }
+
+
+def load_image(path):
+    """
+    Read a binary memory image, reading each memory straight from the blob
+    """
+    blob, entries = image.read_manifest(path)
+    memories = {}
+    for entry in entries:
+        size = entry["elem_size"]
+        if size > 8:  # NumPy has no wider integers
+            raise ValueError(f"{entry['name']} is too wide to simulate.")
+        data = np.fromfile(
+            blob, dtype=f"<u{size}", count=entry["length"], offset=entry["offset"]
+        )
+        memories[entry["name"]] = (data.astype(np.int64), entry["format"])
+    return memories
+
+
+def numbered(memories, prefix):
+    """
+    The arrays of the memories named prefix1, prefix2, ..., in order
+    """
+    found = {}
+    for name, (data, _) in memories.items():
+        match = re.fullmatch(rf"{prefix}(\d+)", name)
+        if match:
+            found[int(match.group(1))] = data
+    if sorted(found) != list(range(1, len(found) + 1)):
+        raise ValueError(f"The {prefix} memories are not numbered 1 to {len(found)}.")
+    return [found[i] for i in range(1, len(found) + 1)]
+
+
+def node_layout(memories):
+    """
+    Arrange the input memories by node. Return a (max_nodes, max_steps)
+    array of path ids, a table whose rows are paths_to_consider memories,
+    and the row of that table that each node uses.
+    """
+    if "depth_output" not in memories:
+        raise ValueError("The input has no depth_output memory.")
+    max_nodes = len(memories["depth_output"][0])
+
+    if "path_ids_bank1" in memories:  # A processing-element accelerator
+        banks = numbered(memories, "path_ids_bank")
+        total = sum(len(bank) for bank in banks)
+        if max_nodes == 0 or total % max_nodes:
+            raise ValueError("The path_ids banks do not hold max_nodes nodes.")
+        max_steps = total // max_nodes
+        if any(max_steps == 0 or len(bank) % max_steps for bank in banks):
+            raise ValueError("The path_ids banks do not hold whole nodes.")
+        path_ids = np.concatenate(banks)
+        ptc_row = np.repeat(
+            np.arange(len(banks)), [len(bank) // max_steps for bank in banks]
+        )
+        prefix = "paths_to_consider_bank"
+    else:
+        nodes = numbered(memories, "path_ids")
+        if len(nodes) != max_nodes:
+            raise ValueError(f"Expected {max_nodes} path_ids memories.")
+        if len({len(node) for node in nodes}) > 1:
+            raise ValueError("The path_ids memories differ in size.")
+        max_steps = len(nodes[0]) if nodes else 0
+        path_ids = np.concatenate(nodes) if nodes else np.zeros(0, np.int64)
+        ptc_row = np.arange(max_nodes)
+        prefix = "paths_to_consider"
+
+    if "paths_to_consider" in memories:  # Shared by every node
+        ptc = memories["paths_to_consider"][0][np.newaxis, :]
+        ptc_row = np.zeros(max_nodes, dtype=np.int64)
+    else:
+        rows = numbered(memories, prefix)
+        if len(rows) != ptc_row.max(initial=-1) + 1:
+            raise ValueError(f"Expected one {prefix} memory per node or bank.")
+        if len({len(row) for row in rows}) > 1:
+            raise ValueError("The paths_to_consider memories differ in size.")
+        ptc = np.stack(rows)
+
+    return path_ids.reshape(max_nodes, max_steps), ptc, ptc_row
+
+
+def simulate(memories):
+    """
+    Compute the accelerator's output memories, depth_output and uniq_output,
+    from its input memories (as returned by load)
+    """
+    for name, (data, fmt) in memories.items():
+        if data.size and (data.min() < 0 or data.max() >> int(fmt["width"])):
+            raise ValueError(f"{name} has a value that does not fit its width.")
+
+    path_ids, ptc, ptc_row = node_layout(memories)
+    max_nodes, max_steps = path_ids.shape
+    max_paths = ptc.shape[1] - 1
+    if path_ids.size and path_ids.max() > max_paths:
+        raise ValueError("A path id is larger than max_paths.")
+
+    # Depth: count each step whose path is considered
+    rows = ptc_row[:, np.newaxis]
+    considered = ptc[rows, path_ids] != 0
+    depths = considered.sum(axis=1)
+
+    # Uniq depth: count each distinct path id (other than 0) that is
+    # considered, by numbering the (node, path id) pairs
+    nodes = np.arange(max_nodes)[:, np.newaxis]
+    pairs = np.unique(
+        (nodes * (max_paths + 1) + path_ids)[considered & (path_ids != 0)]
+    )
+    uniqs = np.bincount(pairs // (max_paths + 1), minlength=max_nodes)
+
+    depth_mask = (1 << max_steps.bit_length()) - 1
+    uniq_mask = (1 << max_paths.bit_length()) - 1
+    return {
+        "depth_output": (depths & depth_mask).tolist(),
+        "uniq_output": (uniqs & uniq_mask).tolist(),
+    }
+
+
+def simulate_file(filename):
+    """
+    Simulate the accelerator on an input file. The output has the same form
+    as the Calyx interpreter's.
+    """
+    return {"main": simulate(load(filename))}
+
+
+def config_parser(parser):
+    """Configure the commandline argument parser"""
+    parser.add_argument(
+        "filename",
+        help="The accelerator input: a .data file or a binary memory image.",
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        help="Specify the output file. If not specified, will dump to stdout.",
+    )
+
+
+def run(args):
+    output = json.dumps(simulate_file(args.filename), indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out_file:
+            out_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    # Parse commandline arguments
+    parser = argparse.ArgumentParser()
+    config_parser(parser)
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,172 @@
+"""
+Timing and profiling for the stages of a node depth run.
+
+A Stages object records, for each stage of a run, its wall time, its peak
+memory use, and the total size of the files it wrote. It can report them
+as JSON lines, one as each stage finishes, or as a table at the end. It
+can also profile each stage that runs in Python with cProfile, writing
+<stage>.pstats files for pstats or snakeviz.
+
+Peak memory is measured for each stage on its own. For stages that run in
+Python, it is the most memory that the stage's allocations (NumPy's
+included) held at once, as tracemalloc traces them. Tracing slows
+allocation down, so it is only on when there is a report to write. For
+stages that run an external tool (like fud) through Stages.run, it is the
+largest resident set size of any command the stage ran, from the
+resource usage that the OS reports when the command exits.
+"""
+
+import cProfile
+import json
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+FORMATS = ["jsonl", "table"]
+
+
+def rusage_bytes(usage):
+    """The peak resident set size in a resource usage, in bytes"""
+    # Linux reports kilobytes, and macOS reports bytes.
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def file_size(filename):
+    """The size of a file, including a binary image's manifest"""
+    size = os.path.getsize(filename)
+    if filename.endswith(".bin") and os.path.exists(filename + ".json"):
+        size += os.path.getsize(filename + ".json")
+    return size
+
+
+class Stages:
+    """
+    Records the stages of a run. With report=None and profile_dir=None it
+    only keeps the records.
+    """
+
+    def __init__(self, report=None, out=None, profile_dir=None):
+        self.report = report
+        self.out = out  # A filename, or None for stderr
+        self.profile_dir = profile_dir
+        self.records = []
+        self.child_peak = None  # The current stage's largest command
+        self.lock = threading.Lock()
+        if self.report and self.out:
+            open(self.out, "w").close()
+
+    def write(self, line):
+        if self.out:
+            with open(self.out, "a") as out_file:
+                out_file.write(line + "\n")
+        else:
+            print(line, file=sys.stderr, flush=True)
+
+    def run(self, cmd):
+        """
+        Run a command as subprocess.run(cmd, capture_output=True, text=True)
+        does, and count its peak memory towards the current stage's. It is
+        safe to call from several threads at once.
+        """
+        if not hasattr(os, "wait4"):  # Not available on Windows
+            return subprocess.run(cmd, capture_output=True, text=True)
+
+        # Send the output to files rather than pipes, so that we can reap
+        # the command ourselves, with its resource usage, without
+        # deadlocking on a full pipe.
+        with tempfile.TemporaryFile("w+") as out, tempfile.TemporaryFile("w+") as err:
+            proc = subprocess.Popen(cmd, stdout=out, stderr=err)
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            out.seek(0)
+            err.seek(0)
+            result = subprocess.CompletedProcess(
+                cmd, proc.returncode, out.read(), err.read()
+            )
+
+        with self.lock:
+            self.child_peak = max(self.child_peak or 0, rusage_bytes(usage))
+        return result
+
+    @contextmanager
+    def stage(self, name, external=False):
+        """
+        Time the stage run in the body of the with statement. The body can
+        add the files that the stage writes to the list it is given.
+        external means that the stage's work happens in commands that it
+        runs with self.run, which cProfile and tracemalloc cannot see.
+        """
+        outputs = []
+        profiler = None
+        if self.profile_dir and not external:
+            profiler = cProfile.Profile()
+        tracing = bool(self.report) and not external
+        started = tracing and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif tracing:  # Someone else is tracing already, so share it
+            tracemalloc.reset_peak()
+        self.child_peak = None
+
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield outputs
+        finally:
+            if profiler:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.pstats"))
+
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                if started:
+                    tracemalloc.stop()
+            else:
+                peak = self.child_peak if external else None
+
+            record = {
+                "stage": name,
+                "seconds": seconds,
+                "peak_bytes": peak,
+                "output_bytes": sum(
+                    file_size(f) for f in outputs if f and os.path.exists(f)
+                ),
+            }
+            self.records.append(record)
+            if self.report == "jsonl":
+                self.write(json.dumps(record))
+
+    def finish(self):
+        """Report the table of stages, if that is the format we want"""
+        if self.report != "table":
+            return
+        rows = [("stage", "seconds", "peak MiB", "output bytes")]
+        for record in self.records:
+            peak = record["peak_bytes"]
+            rows.append(
+                (
+                    record["stage"],
+                    f"{record['seconds']:.3f}",
+                    "-" if peak is None else f"{peak / 2**20:.1f}",
+                    str(record["output_bytes"]),
+                )
+            )
+        rows.append(("total", f"{sum(r['seconds'] for r in self.records):.3f}", "", ""))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        for row in rows:
+            self.write(
+                "  ".join(
+                    cell.ljust(width) if i == 0 else cell.rjust(width)
+                    for i, (cell, width) in enumerate(zip(row, widths))
+                ).rstrip()
+            )
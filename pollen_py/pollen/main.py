@@ -1,6 +1,7 @@
 import argparse
 from sys import exit
 
+import pollen.depth.batch as depth_batch
 import pollen.depth.main as depth
 
 
@@ -16,6 +17,12 @@ def main():
     depth.config_parser(depth_parser)
     depth_parser.set_defaults(command="depth")
 
+    batch_parser = subparsers.add_parser(
+        "depth-batch", help="Compute node depth for every graph in a manifest"
+    )
+    depth_batch.config_parser(batch_parser)
+    batch_parser.set_defaults(command="depth-batch")
+
     args = parser.parse_args()
 
     if "command" not in args:
@@ -25,6 +32,9 @@ def main():
     if args.command == "depth":
         depth.run(args)
 
+    elif args.command == "depth-batch":
+        depth_batch.run(args)
+
     else:
         raise Exception("Command not recognized")
 
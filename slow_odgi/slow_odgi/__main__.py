@@ -1,33 +1,34 @@
 import argparse
+import importlib
+import os
 import sys
 import io
-from typing import Dict, Tuple, List, Optional
+from typing import Any, Dict, Tuple, List, Optional, TextIO
 from collections.abc import Callable
 import mygfa
 
-from . import (
-    chop,
-    crush,
-    degree,
-    depth,
-    flatten,
-    flip,
-    inject,
-    matrix,
-    overlap,
-    paths,
-    proofs,
-    validate,
-    norm,
-    inject_setup,
-    somepaths,
-    validate_setup,
-)
 
+def add_check_argument(parser: argparse.ArgumentParser) -> None:
+    """Let a constructive command choose how to check its output."""
+    parser.add_argument(
+        "--check",
+        choices=["full", "hash", "off"],
+        default="full",
+        help="How to check that the output's paths spell the same sequences: "
+        "compare full sequences, compare their hashes, or skip the check.",
+    )
 
-def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
-    """Parse command line arguments and run the appropriate subcommand."""
+
+def make_parser() -> argparse.ArgumentParser:
+    """Build the parser for all of slow-odgi's commands."""
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backend",
+        choices=["mygfa", "flatgfa"],
+        default="mygfa",
+        help="The graph representation to compute with. The flatgfa backend "
+        "reads .gfa or .flatgfa files and supports only some commands.",
+    )
 
     subparsers = parser.add_subparsers(
         title="slow-odgi commands", metavar="COMMAND", dest="command"
@@ -44,15 +45,21 @@ def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
         help="The max segment size desired after chopping.",
         required=True,
     )
+    add_check_argument(chop_parser)
 
     subparsers.add_parser(
         "crush",
         help="Replaces consecutive instances of `N` with a single `N`.",
     )
 
-    subparsers.add_parser(
+    degree_parser = subparsers.add_parser(
         "degree", help="Generates a table summarizing each segment's degree."
     )
+    degree_parser.add_argument(
+        "--ref",
+        action="store_true",
+        help="Use the reference implementation, which parses the whole graph.",
+    )
 
     depth_parser = subparsers.add_parser(
         "depth", help="Generates a table summarizing each segment's depth."
@@ -68,10 +75,15 @@ def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
         help="Converts the graph into FASTA + BED representation.",
     )
 
-    subparsers.add_parser(
+    flip_parser = subparsers.add_parser(
         "flip",
         help="Flips any paths that step more backward than forward.",
     )
+    flip_parser.add_argument(
+        "--ref",
+        action="store_true",
+        help="Use the reference implementation, which flips one step at a time.",
+    )
 
     inject_parser = subparsers.add_parser(
         "inject", help="Adds new paths, as specified, to the graph."
@@ -82,8 +94,23 @@ def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
         help="A BED file describing the paths you wish to insert.",
         required=True,
     )
+    add_check_argument(inject_parser)
 
-    subparsers.add_parser("matrix", help="Represents the graph as a matrix.")
+    matrix_parser = subparsers.add_parser(
+        "matrix", help="Represents the graph as a matrix."
+    )
+    matrix_parser.add_argument(
+        "--format",
+        choices=["odgi", "mtx", "npz", "coo"],
+        default="odgi",
+        help="The output format: odgi's text dump (the default), Matrix Market, "
+        "a SciPy-compatible sparse .npz, or 0-based COO triples.",
+    )
+    matrix_parser.add_argument(
+        "-o",
+        "--out",
+        help="Write the matrix to this file instead of stdout.",
+    )
 
     overlap_parser = subparsers.add_parser(
         "overlap",
@@ -125,6 +152,54 @@ def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
         help="Don't include links.",
     )
 
+    run_parser = subparsers.add_parser(
+        "run",
+        help="Runs several commands over a single parse of the graph.",
+    )
+    run_parser.add_argument(
+        "--cmd",
+        action="append",
+        required=True,
+        help="A command to run, with any options after a colon, separated by "
+        "commas: for example, `depth:paths=x.txt`. May be repeated.",
+        metavar="SPEC",
+    )
+    run_parser.add_argument(
+        "-o",
+        "--out-dir",
+        default=".",
+        help="The directory in which to write each command's output.",
+    )
+    run_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Run the commands in this many worker processes.",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Keeps the graph in memory and answers queries on a Unix socket.",
+    )
+    serve_parser.add_argument(
+        "--socket", required=True, help="The path of the socket to listen on."
+    )
+
+    query_parser = subparsers.add_parser(
+        "query",
+        help="Sends a command to a running `serve` process and prints its output.",
+    )
+    query_parser.add_argument(
+        "--socket", required=True, help="The path of the server's socket."
+    )
+    query_parser.add_argument(
+        "--cmd",
+        required=True,
+        help="The command to run, in the same form as for `run`.",
+        metavar="SPEC",
+    )
+
     # "Hidden" commands for testing only
     subparsers.add_parser("inject_setup")
     subparsers.add_parser("validate_setup")
@@ -132,13 +207,21 @@ def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
     # Add the graph argument to all subparsers.
     # Doing it this way means that the graph argument is sought _after_ the
     # command name.
-    for subparser in subparsers.choices.values():
+    # (A query's graph is whatever its server has loaded.)
+    for name, subparser in subparsers.choices.items():
+        if name == "query":
+            continue
         subparser.add_argument(
             "graph", nargs="?", help="Input GFA file", metavar="GRAPH"
         )
 
-    args = parser.parse_args()
+    return parser
 
+
+def parse_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
+    """Parse command line arguments and run the appropriate subcommand."""
+    parser = make_parser()
+    args = parser.parse_args()
     return parser, args
 
 
@@ -153,57 +236,162 @@ def parse_paths(filename: str) -> List[str]:
     return list(mygfa.nonblanks(open(filename, "r", encoding="utf-8")))
 
 
+def open_graph(args: argparse.Namespace) -> TextIO:
+    """Open the input graph, which comes from either a filename argument or
+    stdin (if the filename is unspecified)."""
+    if args.graph:
+        return open(args.graph, "r", encoding="utf-8")
+    return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+
+
+def load_command(name: str) -> Any:
+    """Import the module that implements a slow-odgi command.
+    We only import the command that is actually run, which keeps startup
+    (and its dependencies, such as NumPy) cheap."""
+    return importlib.import_module(f".{name}", __package__)
+
+
 def dispatch(args: argparse.Namespace) -> None:
     """Parse the graph from filename,
-    parse any additional files if needed,
+    then dispatch to the appropriate slow-odgi command."""
+
+    # Functions that scan the input file themselves instead of working on a
+    # parsed graph. These are the fast paths for commands that only need a
+    # small part of the file.
+    stream_funcs: Dict[str, Callable[[TextIO], object]] = {}
+    if not vars(args).get("ref"):
+        stream_funcs["degree"] = lambda f: load_command("degree").degree_stream(f)
+    stream_funcs["paths"] = lambda f: load_command("paths").paths_stream(f)
+    stream_funcs["somepaths"] = lambda f: load_command("somepaths").somepaths_stream(
+        f, args.drop
+    )
+
+    if args.backend == "flatgfa":
+        dispatch_flatgfa(args)
+        return
+
+    in_file = open_graph(args)
+    if args.command in stream_funcs:
+        stream_funcs[args.command](in_file)
+        return
+    run_command(args, mygfa.Graph.parse(in_file))
+
+
+def dispatch_flatgfa(args: argparse.Namespace) -> None:
+    """Load the graph with FlatGFA, then dispatch to the FlatGFA version of
+    the slow-odgi command."""
+    # The flatgfa package is optional, so we only import it when asked.
+    from . import flatgfa_backend
+
+    funcs: Dict[str, Callable[[Any], object]] = {
+        "degree": flatgfa_backend.degree,
+        "depth": lambda g: flatgfa_backend.depth(
+            g, parse_paths(args.paths) if args.paths else None
+        ),
+        "overlap": lambda g: flatgfa_backend.overlap(g, parse_paths(args.paths)),
+        "paths": flatgfa_backend.paths,
+        "validate": flatgfa_backend.validate,
+    }
+    if args.command not in funcs:
+        sys.exit(f"the flatgfa backend does not support {args.command}")
+    if not args.graph:
+        sys.exit("the flatgfa backend needs a graph file")
+    funcs[args.command](flatgfa_backend.load(args.graph))
+
+
+def dispatch_pipeline(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    """Parse the graph once, then run each of the requested commands on it,
+    writing each command's output to its own file."""
+    from . import pipeline
+
+    cmd_args = []
+    for spec in args.cmd:
+        argv = pipeline.spec_argv(spec)
+        if argv[0] not in pipeline.COMMANDS:
+            parser.error(f"command {argv[0]} cannot be used in a pipeline")
+        cmd_args.append(parser.parse_args(argv + ([args.graph] if args.graph else [])))
+
+    base = os.path.splitext(os.path.basename(args.graph))[0] if args.graph else "stdin"
+    out_names = pipeline.out_names(base, [a.command for a in cmd_args])
+    jobs = [
+        (a, os.path.join(args.out_dir, name)) for a, name in zip(cmd_args, out_names)
+    ]
+
+    graph = mygfa.Graph.parse(open_graph(args))
+    pipeline.run_pipeline(graph, run_command, jobs, args.jobs)
+
+
+def dispatch_server(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Parse the graph once, then answer queries about it until interrupted."""
+    from . import server
+
+    graph = mygfa.Graph.parse(open_graph(args))
+    server.serve(graph, args.socket, parser.parse_args, run_command)
+
+
+def dispatch_query(args: argparse.Namespace) -> None:
+    """Send a query to a running server and print the result."""
+    from . import pipeline, server
+
+    response = server.query(args.socket, pipeline.spec_argv(args.cmd))
+    if not response["ok"]:
+        print(response["error"], end="", file=sys.stderr)
+        sys.exit(1)
+    print(response["output"], end="")
+
+
+def run_command(args: argparse.Namespace, graph: mygfa.Graph) -> None:
+    """Parse any additional files if needed,
     then dispatch to the appropriate slow-odgi command.
     If the command makes a new graph, emit it to stdout."""
 
+    cmd = load_command(args.command)
+
     # Functions that produce a new graph.
     transformer_funcs: Dict[str, Callable[[mygfa.Graph], mygfa.Graph]] = {
-        "chop": lambda g: chop.chop(g, int(args.n)),
-        "crush": crush.crush,
-        "flip": flip.flip,
-        "inject": lambda g: inject.inject(g, parse_bedfile(args.bed)),
-        "norm": norm.norm,
-        "validate_setup": validate_setup.drop_some_links,
+        "chop": lambda g: cmd.chop(g, int(args.n)),
+        "crush": lambda g: cmd.crush(g),
+        "flip": lambda g: cmd.flip(g) if args.ref else cmd.flip_bulk(g),
+        "inject": lambda g: cmd.inject(g, parse_bedfile(args.bed)),
+        "norm": lambda g: cmd.norm(g),
+        "validate_setup": lambda g: cmd.drop_some_links(g),
     }
 
     # Other functions, which typically print their own output.
     other_funcs: Dict[str, Callable[[mygfa.Graph], object]] = {
-        "degree": degree.degree,
-        "depth": lambda g: depth.depth(
+        "degree": lambda g: cmd.degree(g),
+        "depth": lambda g: cmd.depth(
             g, parse_paths(args.paths) if args.paths else None
         ),
-        "flatten": lambda g: flatten.flatten(g, f"{args.graph[:-4]}.og"),
-        "matrix": matrix.matrix,
-        "overlap": lambda g: overlap.overlap(g, parse_paths(args.paths)),
-        "paths": paths.paths,
-        "somepaths": lambda g: somepaths.somepaths(g, args.drop),
-        "validate": validate.validate,
-        "inject_setup": inject_setup.print_bed,
+        "flatten": lambda g: cmd.flatten(g, f"{args.graph[:-4]}.og"),
+        "matrix": lambda g: (
+            cmd.matrix(g)
+            if args.format == "odgi"
+            else cmd.export(g, args.format, args.out)
+        ),
+        "overlap": lambda g: cmd.overlap(g, parse_paths(args.paths)),
+        "paths": lambda g: cmd.paths(g),
+        "somepaths": lambda g: cmd.somepaths(g, args.drop),
+        "validate": lambda g: cmd.validate(g),
+        "inject_setup": lambda g: cmd.print_bed(g),
     }
 
     show_no_links = ["chop", "inject"]
     constructive_changes = ["chop", "inject"]
     # These commands only add to the graph, so we'll assert "logically_le".
 
-    # Parse the input graph, which comes from either a filename argument or
-    # stdin (if the filename is unspecified).
-    if args.graph:
-        in_file = open(args.graph, "r", encoding="utf-8")
-    else:
-        in_file = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
-    graph = mygfa.Graph.parse(in_file)
-
     # Run the appropriate command on the input graph.
     if args.command in transformer_funcs:
         out_graph = transformer_funcs[args.command](graph)
         out_graph.emit(
             sys.stdout, args.command not in show_no_links and not vars(args).get("nl")
         )
-        if args.command in constructive_changes:
-            assert proofs.logically_le(graph, out_graph)
+        if args.command in constructive_changes and args.check != "off":
+            from . import proofs
+
+            assert proofs.logically_le(graph, out_graph, args.check == "hash")
     elif args.command in other_funcs:
         other_funcs[args.command](graph)
     else:
@@ -213,7 +401,14 @@ def dispatch(args: argparse.Namespace) -> None:
 def main() -> None:
     """Parse command line arguments and run the appropriate subcommand."""
     parser, args = parse_args()
-    dispatch(args)
+    if args.command == "run":
+        dispatch_pipeline(parser, args)
+    elif args.command == "serve":
+        dispatch_server(parser, args)
+    elif args.command == "query":
+        dispatch_query(args)
+    else:
+        dispatch(args)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,6 @@
+import sys
+from array import array
+from typing import Dict, TextIO
 import mygfa
 import mygfa.preprocess
 
@@ -16,3 +19,32 @@ def degree(graph: mygfa.Graph) -> mygfa.Graph:
         )
         print("\t".join([segname, str(in_degree + out_degree)]))
     return graph
+
+
+def degree_stream(infile: TextIO) -> None:
+    """Compute the same table as `degree`, straight from a GFA file.
+
+    A segment's degree is the number of times it appears as a link
+    endpoint, so we only need the names on S- and L-lines; paths are
+    skipped without being parsed. Each endpoint is mapped to a dense
+    integer id, and one `bincount` over those ids yields every degree.
+    """
+    import numpy as np
+
+    ids: Dict[str, int] = {}  # Segment name -> dense id.
+    segments: Dict[str, None] = {}  # Declared segments, in file order.
+    ends = array("q")  # The id of every link endpoint.
+
+    for line in infile:
+        if line.startswith("S"):
+            name = line.split(maxsplit=2)[1]
+            segments[name] = None
+            ids.setdefault(name, len(ids))
+        elif line.startswith("L"):
+            _, from_, _, to_ = line.split(maxsplit=4)[:4]
+            ends.append(ids.setdefault(from_, len(ids)))
+            ends.append(ids.setdefault(to_, len(ids)))
+
+    counts = np.bincount(np.frombuffer(ends, dtype=np.int64), minlength=len(ids))
+    sys.stdout.write("\t".join(["#node.id", "node.degree"]) + "\n")
+    sys.stdout.write("".join(f"{name}\t{counts[ids[name]]}\n" for name in segments))
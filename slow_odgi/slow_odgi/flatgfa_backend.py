@@ -0,0 +1,125 @@
+"""Implementations of some slow-odgi commands over a FlatGFA graph.
+
+These read the graph through the `flatgfa` Python bindings instead of
+`mygfa`, and they print the same output as their `mygfa` counterparts,
+which remain the reference implementations.
+"""
+
+import os
+from typing import List, Optional, Set, Tuple
+import numpy as np
+import flatgfa
+
+# A handle as a (segment id, forward?) pair.
+HandleKey = Tuple[int, bool]
+
+
+def load(filename: str) -> flatgfa.FlatGFA:
+    """Memory-map a `.flatgfa` file, or parse any other file as GFA text."""
+    if os.path.splitext(filename)[1] == ".flatgfa":
+        return flatgfa.load(filename)
+    return flatgfa.parse(filename)
+
+
+def path_name(path: flatgfa.Path) -> str:
+    """The path's name as a string. (Some versions of the bindings give
+    names as bytes.)"""
+    name = path.name
+    return name.decode() if isinstance(name, bytes) else name
+
+
+def seg_ids(path: flatgfa.Path) -> np.ndarray:
+    """The segment id of every step in the path."""
+    return np.fromiter((h.seg_id for h in path), dtype=np.int64, count=len(path))
+
+
+def handle_str(gfa: flatgfa.FlatGFA, handle: HandleKey) -> str:
+    """Print a handle the way a path does, like `3+`."""
+    seg_id, forward = handle
+    return f"{gfa.segments[seg_id].name}{'+' if forward else '-'}"
+
+
+def paths(gfa: flatgfa.FlatGFA) -> None:
+    """Print the names of the paths in the graph."""
+    print("\n".join(path_name(path) for path in gfa.paths))
+
+
+def depth(gfa: flatgfa.FlatGFA, inputpaths: Optional[List[str]]) -> None:
+    """Print each segment's depth and unique depth, optionally counting only
+    the steps on `inputpaths`."""
+    nsegs = len(gfa.segments)
+    depths = np.zeros(nsegs, dtype=np.int64)
+    uniqs = np.zeros(nsegs, dtype=np.int64)
+    for path in gfa.paths:
+        if inputpaths is not None and path_name(path) not in inputpaths:
+            continue
+        ids = seg_ids(path)
+        depths += np.bincount(ids, minlength=nsegs)
+        uniqs[np.unique(ids)] += 1
+
+    print("\t".join(["#node.id", "depth", "depth.uniq"]))
+    for seg in gfa.segments:
+        print(f"{seg.name}\t{depths[seg.id]}\t{uniqs[seg.id]}")
+
+
+def degree(gfa: flatgfa.FlatGFA) -> None:
+    """Print each segment's degree: the number of link endpoints on it."""
+    ends = np.fromiter(
+        (h.seg_id for link in gfa.links for h in (link.from_, link.to)),
+        dtype=np.int64,
+        count=2 * len(gfa.links),
+    )
+    counts = np.bincount(ends, minlength=len(gfa.segments))
+
+    print("\t".join(["#node.id", "node.degree"]))
+    for seg in gfa.segments:
+        print(f"{seg.name}\t{counts[seg.id]}")
+
+
+def validate(gfa: flatgfa.FlatGFA) -> None:
+    """Report every pair of adjacent path steps that no link supports."""
+    links: Set[Tuple[HandleKey, HandleKey]] = set()
+    for link in gfa.links:
+        links.add(
+            (
+                (link.from_.seg_id, link.from_.is_forward),
+                (link.to.seg_id, link.to.is_forward),
+            )
+        )
+
+    for path in gfa.paths:
+        steps = [(h.seg_id, h.is_forward) for h in path]
+        for seg_from, seg_to in zip(steps, steps[1:]):
+            rev_from = (seg_from[0], not seg_from[1])
+            rev_to = (seg_to[0], not seg_to[1])
+            if (seg_from, seg_to) not in links and (rev_to, rev_from) not in links:
+                print(
+                    f"[odgi::validate] error: the path {path_name(path)} "
+                    "does not respect the graph topology: the link "
+                    f"{handle_str(gfa, seg_from)},{handle_str(gfa, seg_to)} "
+                    "is missing."
+                )
+
+
+def overlap(gfa: flatgfa.FlatGFA, inputpaths: List[str]) -> None:
+    """Print the paths that share an oriented segment with each input path."""
+    seg_lens = np.fromiter(
+        (len(seg.sequence()) for seg in gfa.segments),
+        dtype=np.int64,
+        count=len(gfa.segments),
+    )
+    by_name = {path_name(path): path for path in gfa.paths}
+    handles = {
+        name: {(h.seg_id, h.is_forward) for h in path} for name, path in by_name.items()
+    }
+
+    header_printed = False
+    for ip in inputpaths:
+        assert ip in by_name
+        length = int(seg_lens[seg_ids(by_name[ip])].sum())
+        for name, path_handles in handles.items():
+            if name != ip and handles[ip] & path_handles:
+                if not header_printed:
+                    print("\t".join(["#path", "start", "end", "path.touched"]))
+                    header_printed = True
+                print("\t".join([ip, "0", str(length), name]))
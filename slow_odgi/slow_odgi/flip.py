@@ -1,4 +1,4 @@
-from typing import List, Tuple, Dict
+from typing import List, Set, Tuple, Dict
 from collections.abc import Callable
 import mygfa
 
@@ -80,3 +80,84 @@ def flip(graph: mygfa.Graph) -> mygfa.Graph:
     return mygfa.Graph(
         graph.headers, graph.segments, dedup(graph.links + new_links), paths
     )
+
+
+def canonical(from_: mygfa.Handle, to: mygfa.Handle) -> Tuple[mygfa.Handle, ...]:
+    """A key shared by a link and its reverse, which odgi treats as the
+    same link."""
+    return min((from_, to), (to.rev(), from_.rev()))
+
+
+def flip_bulk(graph: mygfa.Graph) -> mygfa.Graph:
+    """Like `flip`, but working over arrays of encoded steps.
+
+    A handle on the segment with index `i` is encoded as `2 * i` when
+    forward and `2 * i + 1` when reversed, so that reversing a handle just
+    toggles the low bit. A link between two encoded handles `a` and `b` is
+    encoded as `a * n + b`, where `n` is the number of possible handles.
+    """
+    import numpy as np
+
+    names = list(graph.segments)
+    index = {name: i for i, name in enumerate(names)}
+    seg_lens = np.fromiter(
+        (len(seg.seq) for seg in graph.segments.values()),
+        dtype=np.int64,
+        count=len(names),
+    )
+    handles = [mygfa.Handle(name, ori) for name in names for ori in (True, False)]
+    nhandles = len(handles)
+
+    # Every path's steps, end to end.
+    paths = list(graph.paths.items())
+    counts = np.fromiter(
+        (len(p.segments) for _, p in paths), dtype=np.int64, count=len(paths)
+    )
+    steps = np.fromiter(
+        (2 * index[h.name] + (not h.ori) for _, p in paths for h in p.segments),
+        dtype=np.int64,
+        count=int(counts.sum()),
+    )
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    # A path is flipped if its reverse steps cover more sequence than its
+    # forward steps do.
+    lens = seg_lens[steps >> 1]
+    owner = np.repeat(np.arange(len(paths)), counts)
+    balance = np.bincount(
+        owner, weights=np.where(steps & 1, -lens, lens), minlength=len(paths)
+    )
+
+    new_paths = {}
+    new_links = []
+    for k, (name, path) in enumerate(paths):
+        if balance[k] >= 0:
+            new_paths[name] = path.drop_overlaps()
+            continue
+        flipped = steps[offsets[k] : offsets[k + 1]][::-1] ^ 1
+        new_paths[name] = mygfa.Path(
+            f"{path.name}_inv", [handles[h] for h in flipped.tolist()], None
+        )
+        froms, tos = flipped[:-1], flipped[1:]
+        new_links.append(
+            np.minimum(froms * nhandles + tos, (tos ^ 1) * nhandles + (froms ^ 1))
+        )
+
+    # Keep the graph's own links, minus duplicates, and then add the new
+    # links that are not already present.
+    seen: Set[Tuple[Tuple[mygfa.Handle, ...], str]] = set()
+    links = []
+    for link in graph.links:
+        key = (canonical(link.from_, link.to_), str(link.overlap))
+        if key not in seen:
+            seen.add(key)
+            links.append(link)
+
+    alignment = mygfa.Alignment([(0, mygfa.AlignOp("M"))])
+    if new_links:
+        for code in np.unique(np.concatenate(new_links)).tolist():
+            from_, to = handles[code // nhandles], handles[code % nhandles]
+            if (canonical(from_, to), str(alignment)) not in seen:
+                links.append(mygfa.Link(from_, to, alignment))
+
+    return mygfa.Graph(graph.headers, graph.segments, links, new_paths)
@@ -1,6 +1,17 @@
+import sys
+from typing import TYPE_CHECKING, BinaryIO, Optional, TextIO, Tuple
 import mygfa
 import mygfa.preprocess
 
+if TYPE_CHECKING:
+    # NumPy is only imported by the functions that need it, so that the
+    # plain `matrix` command does not pay for loading it.
+    import numpy as np
+
+
+# How many matrix entries to format at a time when writing text output.
+CHUNK_SIZE = 1 << 16
+
 
 def matrix(graph: mygfa.Graph) -> mygfa.Graph:
     """Print the graph in sparse matrix format."""
@@ -15,3 +26,100 @@ def matrix(graph: mygfa.Graph) -> mygfa.Graph:
             print(" ".join([seg.name, neighbor.name, "1"]))
             print(" ".join([neighbor.name, seg.name, "1"]))
     return graph
+
+
+def adjacency(graph: mygfa.Graph) -> Tuple["np.ndarray", "np.ndarray", int]:
+    """Build the graph's adjacency matrix in COO form.
+
+    Returns the row and column arrays, which hold (integer) segment
+    names, and the highest segment name, which is the matrix's dimension.
+    As in `matrix`, each link contributes two entries, one in each
+    direction, and the orientation of the link's handles is ignored.
+    """
+    import numpy as np
+
+    ends = np.fromiter(
+        (int(handle.name) for link in graph.links for handle in (link.from_, link.to_)),
+        dtype=np.int64,
+        count=2 * len(graph.links),
+    )
+    froms, tos = ends[0::2], ends[1::2]
+
+    rows = np.empty_like(ends)
+    cols = np.empty_like(ends)
+    rows[0::2], rows[1::2] = froms, tos
+    cols[0::2], cols[1::2] = tos, froms
+
+    topseg = max(int(name) for name in graph.segments.keys())
+    return rows, cols, topseg
+
+
+def write_entries(
+    out: TextIO, rows: "np.ndarray", cols: "np.ndarray", sep: str
+) -> None:
+    """Write one `row col 1` line per matrix entry, a chunk at a time."""
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = zip(
+            rows[start : start + CHUNK_SIZE].tolist(),
+            cols[start : start + CHUNK_SIZE].tolist(),
+        )
+        out.write("".join(f"{row}{sep}{col}{sep}1\n" for row, col in chunk))
+
+
+def write_mtx(out: TextIO, rows: "np.ndarray", cols: "np.ndarray", topseg: int) -> None:
+    """Emit a Matrix Market coordinate file. Indices are segment names,
+    which are already 1-based."""
+    out.write("%%MatrixMarket matrix coordinate integer general\n")
+    out.write(f"{topseg} {topseg} {len(rows)}\n")
+    write_entries(out, rows, cols, " ")
+
+
+def write_npz(
+    out: BinaryIO, rows: "np.ndarray", cols: "np.ndarray", topseg: int
+) -> None:
+    """Emit the arrays that `scipy.sparse.save_npz` would write for a COO
+    matrix, so that `scipy.sparse.load_npz` can read them back.
+    Indices are 0-based, so segment `n` lives in row and column `n - 1`.
+    """
+    import numpy as np
+
+    np.savez(
+        out,
+        row=(rows - 1).astype(np.int32),
+        col=(cols - 1).astype(np.int32),
+        data=np.ones(len(rows), dtype=np.int32),
+        shape=np.array([topseg, topseg]),
+        format=np.array(b"coo"),
+    )
+
+
+def export(graph: mygfa.Graph, fmt: str, out: Optional[str]) -> mygfa.Graph:
+    """Write the graph's adjacency matrix in a machine-readable format:
+    `mtx` (Matrix Market), `npz` (SciPy sparse), or `coo` (0-based,
+    tab-separated `row col value` triples).
+    Output goes to the file `out`, or to stdout if none is given.
+    """
+    rows, cols, topseg = adjacency(graph)
+
+    if fmt == "npz":
+        # Write through a file object: given a name, `np.savez` would
+        # append `.npz` to it.
+        if out:
+            with open(out, "wb") as binfile:
+                write_npz(binfile, rows, cols, topseg)
+        else:
+            write_npz(sys.stdout.buffer, rows, cols, topseg)
+        return graph
+
+    outfile = open(out, "w", encoding="utf-8") if out else sys.stdout
+    try:
+        if fmt == "mtx":
+            write_mtx(outfile, rows, cols, topseg)
+        elif fmt == "coo":
+            write_entries(outfile, rows - 1, cols - 1, "\t")
+        else:
+            assert False, f"unknown matrix format {fmt}"
+    finally:
+        if out:
+            outfile.close()
+    return graph
@@ -1,4 +1,5 @@
 import sys
+from typing import Iterator, TextIO
 import mygfa
 
 
@@ -9,5 +10,19 @@ def paths(graph: mygfa.Graph) -> mygfa.Graph:
     return graph
 
 
+def path_names(infile: TextIO) -> Iterator[str]:
+    """Yield the name of each path in a GFA file, in order.
+    Only P-lines are split; every other line is skipped unparsed.
+    """
+    for line in infile:
+        if line.startswith("P"):
+            yield line.split(maxsplit=2)[1]
+
+
+def paths_stream(infile: TextIO) -> None:
+    """Print the same list as `paths`, straight from a GFA file."""
+    sys.stdout.writelines(f"{name}\n" for name in path_names(infile))
+
+
 if __name__ == "__main__":
     paths(mygfa.Graph.parse(open(sys.argv[1], "r", encoding="utf-8")))
@@ -0,0 +1,100 @@
+"""Run several slow-odgi commands over a single parse of a graph."""
+
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional, Tuple
+import mygfa
+import mygfa.preprocess
+
+
+# The commands that may appear in a pipeline. These only read the graph, so
+# they can safely share one parsed copy of it (and its indexes).
+COMMANDS = [
+    "degree",
+    "depth",
+    "flatten",
+    "matrix",
+    "overlap",
+    "paths",
+    "somepaths",
+    "validate",
+]
+
+Runner = Callable[[argparse.Namespace, mygfa.Graph], None]
+Job = Tuple[argparse.Namespace, str]  # A command's arguments and output file.
+
+# The graph and runner for worker processes, which inherit them when forked.
+_worker_state: Optional[Tuple[mygfa.Graph, Runner]] = None
+
+
+def spec_argv(spec: str) -> List[str]:
+    """Turn a command spec like `depth:paths=x.txt` into the arguments that
+    the command would take on the command line, like `depth --paths x.txt`.
+    Options are separated by commas; an option without a value is a flag.
+    """
+    name, _, opts = spec.partition(":")
+    argv = [name]
+    for opt in opts.split(",") if opts else []:
+        key, eq, value = opt.partition("=")
+        argv.append(f"-{key}" if len(key) == 1 else f"--{key}")
+        if eq:
+            argv.append(value)
+    return argv
+
+
+def out_names(base: str, commands: List[str]) -> List[str]:
+    """Name each command's output file after the graph and the command.
+    Commands that appear more than once get numbered.
+    """
+    counts: Dict[str, int] = {}
+    names = []
+    for cmd in commands:
+        counts[cmd] = counts.get(cmd, 0) + 1
+        n = counts[cmd]
+        names.append(f"{base}.{cmd}" if n == 1 else f"{base}.{cmd}.{n}")
+    return names
+
+
+def run_job(graph: mygfa.Graph, runner: Runner, job: Job) -> None:
+    """Run one command, sending its output to its own file."""
+    args, out_file = job
+    with open(out_file, "w", encoding="utf-8") as out, redirect_stdout(out):
+        runner(args, graph)
+
+
+def _run_in_worker(job: Job) -> None:
+    assert _worker_state is not None
+    graph, runner = _worker_state
+    run_job(graph, runner, job)
+
+
+def run_pipeline(
+    graph: mygfa.Graph, runner: Runner, jobs: List[Job], workers: int = 1
+) -> None:
+    """Run every job over `graph`.
+
+    Sequentially, the jobs share the graph's indexes (see
+    `mygfa.preprocess.shared_indexes`). With several workers, the jobs run
+    in forked processes that each inherit the parsed graph.
+    """
+    for _, out_file in jobs:
+        os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+
+    if workers <= 1:
+        with mygfa.preprocess.shared_indexes():
+            for job in jobs:
+                run_job(graph, runner, job)
+        return
+
+    global _worker_state
+    _worker_state = (graph, runner)
+    try:
+        ctx = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+            for result in [pool.submit(_run_in_worker, job) for job in jobs]:
+                result.result()
+    finally:
+        _worker_state = None
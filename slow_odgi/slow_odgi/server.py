@@ -0,0 +1,142 @@
+"""Keep a parsed graph in memory and answer slow-odgi queries about it over a
+Unix socket.
+
+The protocol is one JSON object per line. A request looks like
+`{"argv": ["depth", "--paths", "x.txt"], "cwd": "/some/dir"}`; the server
+runs the command as if it had been invoked from `cwd` and replies with
+`{"ok": true, "output": "..."}` or `{"ok": false, "error": "..."}`. A line
+that is not such a request gets an error response, and the connection
+stays open.
+"""
+
+import asyncio
+import io
+import json
+import os
+import signal
+import socket
+import sys
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Callable, Dict, List
+import mygfa
+import mygfa.preprocess
+
+# The commands that the server answers. Like the commands in a pipeline,
+# these only read the graph. (`flatten` is left out because it names its
+# output after the graph's file.)
+COMMANDS = ["degree", "depth", "matrix", "overlap", "paths", "somepaths", "validate"]
+
+# The formats that a command can only write to a file, not as a response.
+BINARY_FORMATS = ["npz"]
+
+# Parses a command's argv, like the main slow-odgi parser.
+ArgParser = Callable[[List[str]], Any]
+Runner = Callable[[Any, mygfa.Graph], None]
+
+
+def decode(line: bytes) -> Dict[str, Any]:
+    """Parse one request line, raising ValueError if it is malformed."""
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("a request must be a JSON object")
+    argv = request.get("argv")
+    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+        raise ValueError('a request needs an "argv" list of strings')
+    if not isinstance(request.get("cwd", ""), str):
+        raise ValueError('a request\'s "cwd" must be a string')
+    return request
+
+
+def answer(
+    graph: mygfa.Graph,
+    parse: ArgParser,
+    runner: Runner,
+    request: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Run one request against the graph and capture its output."""
+    argv = request["argv"]
+    if not argv or argv[0] not in COMMANDS:
+        return {"ok": False, "error": f"unsupported command: {' '.join(argv)}\n"}
+
+    out = io.StringIO()
+    err = io.StringIO()
+    old_cwd = os.getcwd()
+    try:
+        os.chdir(request.get("cwd", old_cwd))
+        with redirect_stdout(out), redirect_stderr(err):
+            args = parse(argv)
+            if getattr(args, "format", None) in BINARY_FORMATS and not args.out:
+                return {
+                    "ok": False,
+                    "error": f"{args.format} output must be written to a file "
+                    "with -o\n",
+                }
+            runner(args, graph)
+    except SystemExit:  # argparse rejected the arguments.
+        return {"ok": False, "error": err.getvalue()}
+    except Exception as exc:
+        return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    finally:
+        os.chdir(old_cwd)
+    return {"ok": True, "output": out.getvalue()}
+
+
+async def serve_forever(
+    graph: mygfa.Graph,
+    socket_path: str,
+    parse: ArgParser,
+    runner: Runner,
+) -> None:
+    """Answer requests on `socket_path` until interrupted."""
+
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while line := await reader.readline():
+            try:
+                request = decode(line)
+            except ValueError as exc:  # Includes JSONDecodeError.
+                response = {"ok": False, "error": f"malformed request: {exc}\n"}
+            else:
+                response = answer(graph, parse, runner, request)
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_unix_server(handle, path=socket_path)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(
+    graph: mygfa.Graph,
+    socket_path: str,
+    parse: ArgParser,
+    runner: Runner,
+) -> None:
+    """Serve queries about `graph` on a Unix socket. The graph's indexes are
+    built on first use and then kept for every later query.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # Exit cleanly, removing the socket, when asked to terminate.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        with mygfa.preprocess.shared_indexes():
+            asyncio.run(serve_forever(graph, socket_path, parse, runner))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def query(socket_path: str, argv: List[str]) -> Dict[str, Any]:
+    """Send one request to a running server and return its response."""
+    request = {"argv": argv, "cwd": os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as conn:
+            conn.write(json.dumps(request).encode() + b"\n")
+            conn.flush()
+            return json.loads(conn.readline())
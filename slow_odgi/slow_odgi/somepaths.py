@@ -1,23 +1,62 @@
 import sys
 import random
+from typing import Iterable, List, TextIO
 import mygfa
+from . import paths
+
+
+def sample(pathnames: Iterable[str], total: int, droprate: int) -> List[str]:
+    """Choose `(100 - droprate)`% of the `total` names, exactly as the
+    seeded `random.sample(list(pathnames), ...)` would, but without
+    holding every name in memory. The positions that `random.sample`
+    picks depend only on the population's size, so we draw them from
+    `range(total)` and then keep just the names at those positions.
+    """
+    keep = int((100 - droprate) / 100 * total)
+    random.seed(4)
+    rank = {pos: i for i, pos in enumerate(random.sample(range(total), keep))}
+    chosen = [""] * keep
+    for pos, name in enumerate(pathnames):
+        if pos in rank:
+            chosen[rank[pos]] = name
+    return chosen
 
 
 def somepaths(graph: mygfa.Graph, droprate: int = 0) -> mygfa.Graph:
     """Print the names of the paths found in `graph`.
     The droprate represents the percentage of paths to drop.
     """
-    pathnames = list(graph.paths.keys())
+    pathnames: Iterable[str] = graph.paths.keys()
     if droprate > 0:
-        random.seed(4)
-        pathnames[:] = random.sample(
-            pathnames, int((100 - droprate) / 100 * len(pathnames))
-        )
+        pathnames = sample(pathnames, len(graph.paths), droprate)
     for name in pathnames:
         print(name)
     return graph
 
 
+def somepaths_stream(infile: TextIO, droprate: int = 0) -> None:
+    """Print the same list as `somepaths`, straight from a GFA file.
+
+    Without a droprate, names are printed as they are read. Otherwise, we
+    first count the paths (the sample size depends on the count) and then
+    rewind for a second scan that samples them. A stream that cannot be
+    rewound has its names buffered instead.
+    """
+    if droprate <= 0:
+        sys.stdout.writelines(f"{name}\n" for name in paths.path_names(infile))
+        return
+
+    pathnames: Iterable[str]
+    if infile.seekable():
+        total = sum(1 for _ in paths.path_names(infile))
+        infile.seek(0)
+        pathnames = paths.path_names(infile)
+    else:
+        pathnames = list(paths.path_names(infile))
+        total = len(pathnames)
+    sys.stdout.writelines(f"{name}\n" for name in sample(pathnames, total, droprate))
+
+
 if __name__ == "__main__":
     somepaths(
         mygfa.Graph.parse(open(sys.argv[1], "r", encoding="utf-8")), int(sys.argv[2])